@@ -1,7 +1,7 @@
 from __future__ import annotations
 from enum import Enum
 from currency import Currency
-import yaml
+from contentcache import load_yaml
 
 class ArmorType(Enum):
     LIGHT = 0,
@@ -46,20 +46,22 @@ class Armor:
 class ArmorReader:
 
     @staticmethod
-    def read_armors_from_file(filename: str) -> dict[str, Armor]:
-        with open(filename, 'r') as file:
-            armors = {}
-            armor_descriptors = yaml.safe_load(file)['armors']
-            for armor_desc in armor_descriptors:
-                id = armor_desc['id']
-                name = armor_desc['name']
-                type = ArmorType[armor_desc['type'].upper()]
-                cost = Currency.from_string(armor_desc['cost'])
-                weight = armor_desc['weight']
-                armor_class = armor_desc['armor_class']
-                min_strength = armor_desc.get('minimum_strength', 0)
-                stealth_disadvantage = armor_desc.get('stealth_disadvantage', False)
+    def read_armor(armor_desc: dict) -> Armor:
+        """Creates the armor from its descriptor in the armor catalog."""
+        name = armor_desc['name']
+        type = ArmorType[armor_desc['type'].upper()]
+        cost = Currency.from_string(armor_desc['cost'])
+        weight = armor_desc['weight']
+        armor_class = armor_desc['armor_class']
+        min_strength = armor_desc.get('minimum_strength', 0)
+        stealth_disadvantage = armor_desc.get('stealth_disadvantage', False)
+
+        return Armor(name, cost, armor_class, type, weight, 
+                     min_strength, stealth_disadvantage)
 
-                armors[id] = Armor(name, cost, armor_class, type, weight, 
-                                   min_strength, stealth_disadvantage)
-            return armors
\ No newline at end of file
+    @classmethod
+    def read_armors_from_file(cls, filename: str) -> dict[str, Armor]:
+        with open(filename, 'r') as file:
+            armor_descriptors = load_yaml(file)['armors']
+            return {armor_desc['id']: cls.read_armor(armor_desc) 
+                    for armor_desc in armor_descriptors}
\ No newline at end of file
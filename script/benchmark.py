@@ -0,0 +1,243 @@
+"""Benchmark suite for the rule engine, dice, content loading and combat."""
+
+from contextlib import contextmanager, redirect_stdout
+from typing import Callable, Iterator, List
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from character import Character, Ability
+from dice import Dice, DiceRoll
+from gamecontroller import GameController
+from ruleengine import Rule, RuleEngine, rule
+from simulation import create_duelists, simulate_fight
+from weapon import DamageType
+import rules.armorclass  # Registers the armor class rules used by the equipment events
+
+"""Registered benchmarks, each yielding the function to measure."""
+BENCHMARKS: dict[str, Callable[[], Iterator[Callable[[], None]]]] = {}
+
+def benchmark(name: str):
+    """Decorator registering a benchmark, a generator yielding the function to measure."""
+    def decorator(setup):
+        BENCHMARKS[name] = contextmanager(setup)
+        return setup
+    return decorator
+
+## Rule engine
+## ===========
+
+def _create_benchmark_rule(action: str) -> type[Rule]:
+    """Creates a rule firing for the specified action."""
+    class BenchmarkRule(Rule):
+        def when(context: RuleEngine.Context, actions: List, value: int) -> bool:
+            return action in actions
+
+        def then(context: RuleEngine.Context, **kwargs) -> None:
+            pass
+    return BenchmarkRule
+
+def _create_benchmark_rules(num_rules: int) -> list[Rule]:
+    """Creates rules matching the benchmark context, every tenth of them eligible for firing."""
+
+    # The decorator registers the rules, which are swapped into the engine only while measuring
+    registered_rules = RuleEngine.rules
+    RuleEngine.rules = []
+    try:
+        return [rule(_create_benchmark_rule('benchmark' if index % 10 == 0 else f'other_{index}'))
+                for index in range(num_rules)]
+    finally:
+        RuleEngine.rules = registered_rules
+
+def _execute_rules_benchmark(num_rules: int):
+    def setup():
+        registered_rules, RuleEngine.rules = RuleEngine.rules, _create_benchmark_rules(num_rules)
+        try:
+            yield lambda: RuleEngine.execute_rules({'actions': ['benchmark'], 'value': 1})
+        finally:
+            RuleEngine.rules = registered_rules
+    return setup
+
+for _num_rules in (10, 100, 1000):
+    benchmark(f'rule_engine/execute_rules[{_num_rules} rules]')(_execute_rules_benchmark(_num_rules))
+
+## Dice
+## ====
+
+@benchmark('dice/roll')
+def _():
+    yield lambda: Dice.roll(2, 6)
+
+@benchmark('dice/from_string')
+def _():
+    yield lambda: DiceRoll.from_string('2d6')
+
+## Character
+## =========
+
+def _create_fighter() -> Character:
+    character = Character()
+    character.ability_scores[Ability.STRENGTH] = 16
+    character.equipped_weapon_id = 'longsword'
+    return character
+
+@benchmark('character/roll_attack')
+def _():
+    yield _create_fighter().roll_attack
+
+@benchmark('character/roll_damage')
+def _():
+    yield _create_fighter().roll_damage
+
+@benchmark('character/suffer_damage')
+def _():
+    character = _create_fighter()
+    character.resistances.append(DamageType.SLASHING)
+
+    def suffer_damage():
+        character.hitpoints = character.max_hitpoints
+        character.suffer_damage(7, DamageType.SLASHING)
+    yield suffer_damage
+
+# The rules fired by the equipment and experience events print, the output is discarded to measure the rules
+
+@benchmark('character/equip_armor')
+def _():
+    character = _create_fighter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield lambda: character.equip_armor('chain_mail')
+
+@benchmark('character/add_experience')
+def _():
+    character = _create_fighter()
+
+    def add_experience():
+        character.experience = 0
+        character.add_experience(300)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield add_experience
+
+## Content and combat
+## ==================
+
+@benchmark('content/load_weapons_and_armors')
+def _():
+    yield GameController.load_weapons_and_armors
+
+@benchmark('combat/simulate_fight')
+def _():
+    c1, c2 = create_duelists()
+
+    def fight():
+        c1.hitpoints, c2.hitpoints = c1.max_hitpoints, c2.max_hitpoints
+        simulate_fight(c1, c2)
+    yield fight
+
+## Startup
+## =======
+
+"""Program measured by the startup benchmarks, exiting right after the first rule engine execution."""
+_STARTUP_PROGRAM = '''
+import os
+from character import Character
+from rules import load_rule_packs
+load_rule_packs(lazy={lazy})
+Character().add_experience(300)
+os._exit(0)
+'''
+
+def _startup_benchmark(lazy: bool):
+    def setup():
+        environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        command = [sys.executable, '-c', _STARTUP_PROGRAM.format(lazy=lazy)]
+        yield lambda: subprocess.run(command, env=environment, stdout=subprocess.DEVNULL, check=True)
+    return setup
+
+# Interpreter launch to the first execute_rules, with the rule packs loaded lazily or imported
+for _lazy in (True, False):
+    benchmark(f'startup/first_execute_rules[{"lazy" if _lazy else "eager"}]')(_startup_benchmark(_lazy))
+
+## Runner
+## ======
+
+def run_benchmark(name: str, repeat = 5, min_time = 0.2) -> dict:
+    """Measures a benchmark, returning the per-call timings in seconds."""
+    with BENCHMARKS[name]() as function:
+
+        # Calibrating the number of calls so that one measurement lasts at least min_time
+        num_loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(num_loops):
+                function()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+            num_loops *= 10 if elapsed < min_time / 10 else 2
+
+        timings = [elapsed / num_loops]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(num_loops):
+                function()
+            timings.append((time.perf_counter() - start) / num_loops)
+
+    return {'min': min(timings), 'mean': statistics.mean(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'loops': num_loops, 'repeat': repeat}
+
+def run_benchmarks(name_filter = '', repeat = 5, min_time = 0.2) -> dict:
+    """Runs the benchmarks whose name contains the filter."""
+    results = {}
+    for name in BENCHMARKS:
+        if name_filter in name:
+            results[name] = run_benchmark(name, repeat, min_time)
+            print(f'{name:<45} {results[name]["min"] * 1e6:>12.2f} us', file=sys.stderr)
+
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': time.time(),
+            'benchmarks': results}
+
+def compare_results(results: dict, baseline: dict, threshold = 0.1) -> list[str]:
+    """Returns the regressions of the results, benchmarks slower than the baseline by the threshold."""
+    regressions = []
+    for name, timing in results['benchmarks'].items():
+        baseline_timing = baseline['benchmarks'].get(name)
+        if baseline_timing is None:
+            continue
+
+        ratio = timing['min'] / baseline_timing['min']
+        print(f'{name:<45} {ratio:>8.2f}x', file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append(f'{name}: {baseline_timing["min"] * 1e6:.2f} us -> '
+                               f'{timing["min"] * 1e6:.2f} us ({ratio:.2f}x)')
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite.')
+    parser.add_argument('--filter', default='', help='only run benchmarks containing this string')
+    parser.add_argument('--output', help='JSON file to save the results into')
+    parser.add_argument('--baseline', help='JSON file of earlier results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown before flagging')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measurements per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per measurement')
+    args = parser.parse_args()
+
+    GameController.load_weapons_and_armors()
+    results = run_benchmarks(args.filter, args.repeat, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare_results(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        sys.exit(1 if regressions else 0)
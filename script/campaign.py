@@ -0,0 +1,140 @@
+"""Long running balancing campaigns over every weapon and armor pair, with checkpointing."""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import time
+from armor import ArmorType
+from character import Character
+from gamecontroller import GameController
+from simulation import simulate_fight
+import rules.armorclass  # Registers the armor class rules used by equip_armor
+
+class Campaign:
+    """
+    Simulates fights between an attacker wielding each weapon and a defender
+    wearing each armor of the catalog. Every (weapon, armor) pair is one work
+    unit, the results are accumulated per unit.
+
+    The progress is periodically saved into a checkpoint file, containing the
+    completed units, their results and the state of the random generator.
+    A campaign restarted with the same checkpoint file resumes after the last
+    saved unit and yields the same results as an uninterrupted run.
+    """
+
+    """Version of the checkpoint file format."""
+    CHECKPOINT_VERSION = 1
+
+    def __init__(self, checkpoint_filename: str, fights_per_unit = 1000, seed = 0,
+                 checkpoint_interval = 30.0, defender_weapon_id = 'quarterstaff'):
+        self.checkpoint_filename = checkpoint_filename
+        self.fights_per_unit = fights_per_unit
+        self.seed = seed
+        self.checkpoint_interval = checkpoint_interval
+        self.defender_weapon_id = defender_weapon_id
+        self.results = {}
+
+    @property
+    def config(self) -> dict:
+        """The parameters a checkpoint has to match to be resumed."""
+        return {'fights_per_unit': self.fights_per_unit, 'seed': self.seed,
+                'defender_weapon_id': self.defender_weapon_id}
+
+    def work_units(self) -> list[tuple[str, str]]:
+        """Returns the (weapon ID, armor ID) pairs of the campaign in execution order."""
+        armor_ids = sorted(armor_id for armor_id, armor in GameController.armors.items()
+                           if armor.type != ArmorType.SHIELD)
+        return [(weapon_id, armor_id) for weapon_id in sorted(GameController.weapons)
+                for armor_id in armor_ids]
+
+    def run(self) -> dict[str, dict]:
+        """Runs the remaining work units of the campaign and returns the results per unit."""
+        random.seed(self.seed)
+        self.results = {}
+        self._load_checkpoint()
+
+        last_checkpoint = time.monotonic()
+        for weapon_id, armor_id in self.work_units():
+            unit = f'{weapon_id}/{armor_id}'
+            if unit in self.results:
+                continue
+
+            self.results[unit] = self._run_unit(weapon_id, armor_id)
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                self._save_checkpoint()
+                last_checkpoint = time.monotonic()
+
+        self._save_checkpoint()
+        return self.results
+
+    def _run_unit(self, weapon_id: str, armor_id: str) -> dict:
+        """Simulates the fights of one work unit."""
+        attacker = Character()
+        attacker.name = 'Attacker'
+        attacker.equipped_weapon_id = weapon_id
+
+        defender = Character()
+        defender.name = 'Defender'
+        defender.equipped_weapon_id = self.defender_weapon_id
+        defender.equip_armor(armor_id)
+
+        num_wins = 0
+        num_turns = 0
+        for _ in range(self.fights_per_unit):
+            attacker.hitpoints = attacker.max_hitpoints
+            defender.hitpoints = defender.max_hitpoints
+            winner, _, turns = simulate_fight(attacker, defender)
+            num_wins += winner is attacker
+            num_turns += turns
+
+        return {'fights': self.fights_per_unit, 'attacker_wins': num_wins, 'turns': num_turns}
+
+    ## Checkpointing
+    ## =============
+
+    def _load_checkpoint(self) -> None:
+        """Restores the progress from the checkpoint file, if it exists."""
+        if not os.path.exists(self.checkpoint_filename):
+            return
+
+        with open(self.checkpoint_filename, 'r') as file:
+            checkpoint = json.load(file)
+
+        assert checkpoint['version'] == self.CHECKPOINT_VERSION, \
+               f'Unsupported checkpoint version: {checkpoint["version"]}'
+        assert checkpoint['config'] == self.config, \
+               f'Checkpoint "{self.checkpoint_filename}" belongs to a different campaign'
+
+        self.results = checkpoint['results']
+        version, internal_state, gauss_next = checkpoint['rng_state']
+        random.setstate((version, tuple(internal_state), gauss_next))
+
+    def _save_checkpoint(self) -> None:
+        """Atomically replaces the checkpoint file with the current progress."""
+        checkpoint = {'version': self.CHECKPOINT_VERSION,
+                      'config': self.config,
+                      'results': self.results,
+                      'rng_state': random.getstate()}
+
+        temporary_filename = f'{self.checkpoint_filename}.tmp'
+        with open(temporary_filename, 'w') as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_filename, self.checkpoint_filename)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs a resumable weapon and armor balancing campaign.')
+    parser.add_argument('checkpoint', help='checkpoint file, resumed if it exists')
+    parser.add_argument('--fights', type=int, default=1000, help='fights per weapon and armor pair')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    parser.add_argument('--interval', type=float, default=30.0, help='seconds between checkpoints')
+    args = parser.parse_args()
+
+    GameController.load_weapons_and_armors()
+    campaign = Campaign(args.checkpoint, args.fights, args.seed, args.interval)
+    for unit, result in campaign.run().items():
+        print(f'{unit}: {result["attacker_wins"] / result["fights"]:.3f} win rate, '
+              f'{result["turns"] / result["fights"]:.1f} turns')
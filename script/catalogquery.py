@@ -0,0 +1,168 @@
+"""Secondary indexes and composable queries over the weapon and armor catalogs."""
+
+from __future__ import annotations
+from collections.abc import Mapping
+from typing import Any, Callable, ClassVar
+import bisect
+from currency import Currency
+from gamecontroller import GameController
+
+class CatalogIndex:
+    """
+    Secondary indexes over a catalog of items.
+
+    Attributes with few distinct values (types, flags) are indexed by their
+    value, numeric attributes (cost, weight) are kept as sorted arrays which
+    are searched with bisect for range queries.
+    """
+
+    def __init__(self, items: Mapping[str, Any],
+                 value_keys: dict[str, Callable[[Any], Any]],
+                 range_keys: dict[str, Callable[[Any], float]]):
+        """Builds the indexes, the keys map the attribute names to their getters."""
+        self.items = dict(items)
+        self.all_ids = frozenset(self.items)
+
+        self._value_index = {attribute: {} for attribute in value_keys}
+        for item_id, item in self.items.items():
+            for attribute, key in value_keys.items():
+                self._value_index[attribute].setdefault(key(item), set()).add(item_id)
+
+        self._range_index = {}
+        for attribute, key in range_keys.items():
+            entries = sorted((key(item), item_id) for item_id, item in self.items.items())
+            self._range_index[attribute] = ([value for value, _ in entries],
+                                            [item_id for _, item_id in entries])
+
+    def equal(self, attribute: str, value: Any) -> set[str]:
+        """Returns the IDs of the items whose attribute equals the value."""
+        assert attribute in self._value_index, f'Attribute "{attribute}" is not indexed by value'
+        return self._value_index[attribute].get(value, set())
+
+    def between(self, attribute: str, low: float = None, high: float = None,
+                inclusive = True) -> set[str]:
+        """Returns the IDs of the items whose attribute is within the (optionally open) range."""
+        assert attribute in self._range_index, f'Attribute "{attribute}" is not indexed by range'
+        values, item_ids = self._range_index[attribute]
+        if inclusive:
+            start = 0 if low is None else bisect.bisect_left(values, low)
+            end = len(values) if high is None else bisect.bisect_right(values, high)
+        else:
+            start = 0 if low is None else bisect.bisect_right(values, low)
+            end = len(values) if high is None else bisect.bisect_left(values, high)
+        return set(item_ids[start:end])
+
+class CatalogQuery:
+    """
+    Composable query over a catalog index. Every filter narrows down the
+    result, which is the intersection of the item sets of the filters.
+
+    Example: all finesse weapons dealing piercing damage under 10 gp
+        CatalogQuery.weapons().where(is_finesse=True, damage_type=DamageType.PIERCING) \\
+                              .below('cost', Currency(10, CurrencyType.GOLD)).items()
+    """
+
+    """Getters of the weapon attributes indexed by value and by range."""
+    WEAPON_VALUE_KEYS: ClassVar[dict] = {
+        'type': lambda weapon: weapon.type,
+        'damage_type': lambda weapon: weapon.damage.type,
+        'is_finesse': lambda weapon: weapon.is_finesse,
+        'is_ranged': lambda weapon: weapon.is_ranged,
+    }
+    WEAPON_RANGE_KEYS: ClassVar[dict] = {
+        'cost': lambda weapon: weapon.cost.value,
+        'weight': lambda weapon: weapon.weight,
+    }
+
+    """Getters of the armor attributes indexed by value and by range."""
+    ARMOR_VALUE_KEYS: ClassVar[dict] = {
+        'type': lambda armor: armor.type,
+        'has_stealth_disadvantage': lambda armor: armor.has_stealth_disadvantage,
+    }
+    ARMOR_RANGE_KEYS: ClassVar[dict] = {
+        'cost': lambda armor: armor.cost.value,
+        'weight': lambda armor: armor.weight,
+        'min_strength': lambda armor: armor.min_strength,
+        'armor_class': lambda armor: armor.armor_class,
+    }
+
+    """Indexes of the GameController catalogs, built on first use."""
+    _weapon_index: ClassVar[CatalogIndex | None] = None
+    _armor_index: ClassVar[CatalogIndex | None] = None
+
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+        self._filters = []
+
+    @classmethod
+    def weapons(cls) -> CatalogQuery:
+        """Starts a query over the weapon catalog."""
+        if cls._weapon_index is None:
+            cls._weapon_index = CatalogIndex(GameController.weapons, cls.WEAPON_VALUE_KEYS,
+                                             cls.WEAPON_RANGE_KEYS)
+        return cls(cls._weapon_index)
+
+    @classmethod
+    def armors(cls) -> CatalogQuery:
+        """Starts a query over the armor catalog."""
+        if cls._armor_index is None:
+            cls._armor_index = CatalogIndex(GameController.armors, cls.ARMOR_VALUE_KEYS,
+                                            cls.ARMOR_RANGE_KEYS)
+        return cls(cls._armor_index)
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Drops the indexes, which are rebuilt from the catalogs on next use."""
+        cls._weapon_index = None
+        cls._armor_index = None
+
+    ## Filters
+    ## =======
+
+    def where(self, **values) -> CatalogQuery:
+        """Keeps the items whose attributes equal the specified values."""
+        for attribute, value in values.items():
+            self._filters.append(self.index.equal(attribute, value))
+        return self
+
+    def between(self, attribute: str, low: float | Currency = None,
+                high: float | Currency = None) -> CatalogQuery:
+        """Keeps the items whose attribute is within the inclusive range."""
+        self._filters.append(self.index.between(attribute, self._number(low), self._number(high)))
+        return self
+
+    def below(self, attribute: str, value: float | Currency) -> CatalogQuery:
+        """Keeps the items whose attribute is strictly less than the value."""
+        self._filters.append(self.index.between(attribute, high=self._number(value), inclusive=False))
+        return self
+
+    def above(self, attribute: str, value: float | Currency) -> CatalogQuery:
+        """Keeps the items whose attribute is strictly greater than the value."""
+        self._filters.append(self.index.between(attribute, low=self._number(value), inclusive=False))
+        return self
+
+    @staticmethod
+    def _number(value: float | Currency | None) -> float | None:
+        """Converts currencies to their copper value for comparing with the cost index."""
+        return value.value if isinstance(value, Currency) else value
+
+    ## Results
+    ## =======
+
+    def ids(self) -> set[str]:
+        """Returns the IDs of the matching items."""
+        if not self._filters:
+            return set(self.index.all_ids)
+
+        # Intersecting from the smallest set keeps the intermediate results small
+        filters = sorted(self._filters, key=len)
+        result = set(filters[0])
+        for item_ids in filters[1:]:
+            result.intersection_update(item_ids)
+            if not result:
+                break
+        return result
+
+    def items(self) -> dict[str, Any]:
+        """Returns the matching items by their ID."""
+        return {item_id: self.index.items[item_id] for item_id in sorted(self.ids())}
@@ -1,11 +1,13 @@
 
 from enum import Enum
+import bisect
 from dice import DiceRoll
 from armor import Armor, ArmorType
 from weapon import Weapon, WeaponType, DamageType
 import math
 from gamecontroller import GameController
 from ruleengine import RuleEngine
+from combatlog import EventLog
 
 class Condition(Enum):
     BLINDED = 0,
@@ -85,6 +87,7 @@ class Character:
         self.armor_class = 0
         self.equipped_armor_id = ''
         self.equipped_shield_id = ''
+        self.equipped_weapon_id = ''
         self.active_conditions = set()
 
         self.num_death_save_failure = 0
@@ -136,7 +139,15 @@ class Character:
         20: (355000, 6)
     }
 
-    def add_experience(self, amount: int):
+    """The minimum XP of every level, in the order of the levels."""
+    _LEVEL_XP_THRESHOLDS = [xp_threshold for xp_threshold, _ in _LEVEL_TO_XP_AND_PROFICIENCY.values()]
+
+    @classmethod
+    def level_for_experience(cls, experience: int) -> int:
+        """Returns the level reached with the specified amount of experience."""
+        return bisect.bisect_right(cls._LEVEL_XP_THRESHOLDS, experience)
+
+    def add_experience(self, amount: int, execute_rules = True) -> RuleEngine.Context:
         """
         Adds the specified amount of experience to the character.
         
@@ -151,34 +162,42 @@ class Character:
             - 'character': The character instance that gained a level.
             - 'previous_level': The previous level before levelling-up.
             - 'reached_level': The final level reached after levelling-up.
+
+        The rule context is returned, without executing the rules if disabled
+        (e.g. to execute the rules of a whole party in a batch).
         """
 
         previous_level = self.level
         self.experience += amount
+        reached_level = self.level
 
         context = RuleEngine.Context()
         context.update({'actions': ['on:experience_gained'],
                         'character': self, 
                         'gained_experience': amount})
 
-        if previous_level != self.level:
+        EventLog.emit('experience_gained', character=self.name, gained_experience=amount)
+
+        if previous_level != reached_level:
             context.get('actions').append('on:level_gained')
             context.update({'previous_level': previous_level,
-                            'reached_level': self.level})
+                            'reached_level': reached_level})
+            EventLog.emit('level_gained', character=self.name,
+                          previous_level=previous_level, reached_level=reached_level)
 
-        RuleEngine.execute_rules(context)
+        if execute_rules:
+            RuleEngine.execute_rules(context)
+        return context
 
     @property
     def level(self) -> int:
         """The current level of the character."""
-        return next(level for level, (xp_threshold, _) in reversed(self._LEVEL_TO_XP_AND_PROFICIENCY.items())
-                    if self.experience >= xp_threshold)
+        return self.level_for_experience(self.experience)
     
     @property
     def proficiency_bonus(self) -> int:
         """The current proficiency bonus of the character."""
-        return next(proficiency for (xp_threshold, proficiency) in reversed(self._LEVEL_TO_XP_AND_PROFICIENCY.values())
-                    if self.experience >= xp_threshold)
+        return self._LEVEL_TO_XP_AND_PROFICIENCY[self.level][1]
 
     ## Ability scores
     ## ==============
@@ -189,6 +208,11 @@ class Character:
     def get_ability_modifier(self, ability: Ability) -> int:
         """Returns the specified ability modifier of the character."""
         return math.floor((self.ability_scores[ability] - 10) / 2)
+
+    @property
+    def ability_modifiers(self) -> dict[Ability, int]:
+        """The ability modifiers of the character for every ability."""
+        return {ability: self.get_ability_modifier(ability) for ability in self.ability_scores}
     
     @property
     def strength_modifier(self) -> int:
@@ -273,7 +297,8 @@ class Character:
         """The movement speed of the character."""
 
         # Wearing too heavy armor without sufficient STR slows down the character (PH. 144)
-        if self.equipped_armor.min_strength > self.ability_scores[Ability.STRENGTH]:
+        if self.equipped_armor is not None \
+           and self.equipped_armor.min_strength > self.ability_scores[Ability.STRENGTH]:
             return self.base_speed - 10
         
         return self.base_speed
@@ -299,6 +324,8 @@ class Character:
         """
         if armor_id in GameController.armors:
             self.equipped_armor_id = armor_id
+            EventLog.emit('equipment_changed', character=self.name, change='equipped',
+                          slot='armor', item=self.equipped_armor.name)
             RuleEngine.execute_rules({'actions': ['on:equipped_armor'],
                                       'character': self})
 
@@ -311,6 +338,8 @@ class Character:
             - 'character': The character unequipping the armor.
         """
         if self.equipped_armor_id:
+            EventLog.emit('equipment_changed', character=self.name, change='unequipped',
+                          slot='armor', item=self.equipped_armor.name)
             self.equipped_armor_id = ''
             RuleEngine.execute_rules({'actions': ['on:unequipped_armor'],
                                       'character': self})
@@ -333,6 +362,8 @@ class Character:
         """
         if shield_id in GameController.armors:
             self.equipped_shield_id = shield_id
+            EventLog.emit('equipment_changed', character=self.name, change='equipped',
+                          slot='shield', item=self.equipped_shield.name)
             RuleEngine.execute_rules({'actions': ['on:equipped_shield'],
                                       'character': self})
             
@@ -345,9 +376,30 @@ class Character:
             - 'character': The character unequipping the shield.
         """
         if self.equipped_shield_id:
+            EventLog.emit('equipment_changed', character=self.name, change='unequipped',
+                          slot='shield', item=self.equipped_shield.name)
             self.equipped_shield_id = ''
             RuleEngine.execute_rules({'actions': ['on:unequipped_shield'],
                                       'character': self})
+
+    def update_armor_class(self):
+        """
+        Recalculates the armor class from the equipped armor and shield,
+        dropping the ones which are not in the catalog (anymore).
+
+        This method triggers the 'on:equipped_armor' or 'on:unequipped_armor'
+        and the 'on:equipped_shield' rule actions, like equipping the items.
+        """
+        if self.equipped_armor_id in GameController.armors:
+            RuleEngine.execute_rules({'actions': ['on:equipped_armor'], 'character': self})
+        else:
+            self.equipped_armor_id = ''
+            RuleEngine.execute_rules({'actions': ['on:unequipped_armor'], 'character': self})
+
+        if self.equipped_shield_id in GameController.armors:
+            RuleEngine.execute_rules({'actions': ['on:equipped_shield'], 'character': self})
+        else:
+            self.equipped_shield_id = ''
             
     armor_class: int
         
@@ -422,39 +474,51 @@ class Character:
         else:
             return self.roll_ability_check(ability)
         
-    def roll_attack(self) -> tuple[int, int]:
-        """Rolls an attack with the currently equipped weapon."""
-        dice = DiceRoll.from_string('1d20')
-        base_value = dice.roll()
-        value = base_value
-        
+    @property
+    def attack_modifier(self) -> int:
+        """The modifier added to attack rolls with the currently equipped weapon."""
+
         ## When attacking without a weapon using an "Unarmed Strike" 
         ## it counts as a melee attack (STR modifier applies) and the
         ## character is proficient (PH. 195).
         if self.equipped_weapon is None:
-            value += self.ability_modifiers[Ability.STRENGTH] + self.proficiency_bonus
-            return base_value, value
+            return self.ability_modifiers[Ability.STRENGTH] + self.proficiency_bonus
+
+        ## When the character is proficient with the specific weapon 
+        ## or weapon type the proficiency bonus is also added (PH. 194)
+        if self.equipped_weapon_id in self.weapon_proficiencies \
+           or self.equipped_weapon.type in self.weapon_type_proficiencies:
+            return self.damage_modifier + self.proficiency_bonus
+
+        return self.damage_modifier
+
+    @property
+    def damage_modifier(self) -> int:
+        """The modifier added to damage rolls with the currently equipped weapon."""
+
+        ## When attacking without a weapon using an "Unarmed Strike" 
+        ## the STR modifier applies (PH. 195)
+        if self.equipped_weapon is None:
+            return self.ability_modifiers[Ability.STRENGTH]
 
         ## Finesse weapons allow to choose between STR and DEX modifier (PH. 147)
         ## Here we choose the bigger one assuming a player would do so
         if self.equipped_weapon.is_finesse:
-            value += max(self.ability_modifiers[Ability.DEXTERITY],
-                         self.ability_modifiers[Ability.STRENGTH])
-            
+            return max(self.ability_modifiers[Ability.DEXTERITY],
+                       self.ability_modifiers[Ability.STRENGTH])
+
         ## For non-finesse weapons: ranged weapons use the DEX modifier and 
         ## melee weapons use the STR modifier (PH. 194)
         elif self.equipped_weapon.is_ranged:
-            value += self.ability_modifiers[Ability.DEXTERITY]
+            return self.ability_modifiers[Ability.DEXTERITY]
         else:
-            value += self.ability_modifiers[Ability.STRENGTH]
-
-        ## When the character is proficient with the specific weapon 
-        ## or weapon type the proficiency bonus is also added (PH. 194)
-        if self.equipped_weapon_id in self.weapon_proficiencies \
-           or self.equipped_weapon.type in self.weapon_type_proficiencies:
-            value += self.proficiency_bonus
+            return self.ability_modifiers[Ability.STRENGTH]
 
-        return base_value, value
+    def roll_attack(self) -> tuple[int, int]:
+        """Rolls an attack with the currently equipped weapon."""
+        dice = DiceRoll.from_string('1d20')
+        base_value = dice.roll()
+        return base_value, base_value + self.attack_modifier
 
     def roll_damage(self, is_critical = False) -> tuple[int, DamageType]:
         """Rolls damage with the currently equipped weapon."""
@@ -462,17 +526,10 @@ class Character:
         ## When attacking without a weapon using an "Unarmed Strike" 
         ## the character deals 1 + STR modifier bludgeoning damage (PH. 195)
         if self.equipped_weapon is None:
-            return 1 + self.ability_modifiers[Ability.STRENGTH], DamageType.BLUDGEONING
+            return 1 + self.damage_modifier, DamageType.BLUDGEONING
         
         ## Apply the same ability score modifier as used for the attack roll (PH. 196)
-        modifier = 0
-        if self.equipped_weapon.is_finesse:
-            modifier = max(self.ability_modifiers[Ability.DEXTERITY], 
-                           self.ability_modifiers[Ability.STRENGTH])
-        elif self.equipped_weapon.is_ranged:
-            modifier = self.ability_modifiers[Ability.DEXTERITY]
-        else:
-            modifier = self.ability_modifiers[Ability.STRENGTH]
+        modifier = self.damage_modifier
 
         ## On critical hits the character can roll the damage dice twice and add the 
         ## relevant modifier once (PH. 196)
@@ -588,10 +645,24 @@ class Character:
     ## =======
 
     def do_long_rest(self):
-        pass
+        """
+        Takes a long rest: the character regains all its hitpoints and half
+        of its total hit dice, at least one (PH. 186).
+        """
+        self.heal(self.max_hitpoints)
+        self.num_hit_dice = min(self.level, self.num_hit_dice + max(1, self.level // 2))
 
-    def do_short_rest(self):
-        pass
+    def do_short_rest(self, num_spent_hit_dice = 1) -> int:
+        """
+        Takes a short rest, spending the specified number of hit dice (as far as
+        available): the character heals the roll of each die plus its CON
+        modifier (PH. 186). Returns the number of regained hitpoints.
+        """
+        previous_hitpoints = self.hitpoints
+        for _ in range(min(num_spent_hit_dice, self.num_hit_dice)):
+            self.num_hit_dice -= 1
+            self.heal(max(0, self.hit_dice.roll() + self.constitution_modifier))
+        return self.hitpoints - previous_hitpoints
 
     ## Serialization
     ## =============
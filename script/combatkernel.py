@@ -0,0 +1,232 @@
+"""Vectorized combat kernel simulating many duels at once with NumPy."""
+
+from __future__ import annotations
+import copy
+import math
+import numpy as np
+from character import Character
+from weapon import DamageType
+from simulation import simulate_fight
+
+"""Index of every damage type in the damage type columns of the kernel arrays."""
+_DAMAGE_TYPE_INDEX = {damage_type: index for index, damage_type in enumerate(DamageType)}
+
+class CombatantArrays:
+    """Combat statistics of one side of many duels, one array entry per fight."""
+
+    """The current hitpoints of the combatants."""
+    hitpoints: np.ndarray
+
+    """The armor class of the combatants."""
+    armor_class: np.ndarray
+
+    """The modifier added to the attack rolls of the combatants."""
+    attack_modifier: np.ndarray
+
+    """The modifier added to the damage rolls of the combatants."""
+    damage_modifier: np.ndarray
+
+    """The number of damage dice rolled on a hit (doubled on critical hits)."""
+    num_rolls: np.ndarray
+
+    """The number of sides of the damage dice."""
+    num_sides: np.ndarray
+
+    """The fix damage dealt on normal hits."""
+    fixed_damage: np.ndarray
+
+    """The fix damage dealt on critical hits."""
+    critical_fixed_damage: np.ndarray
+
+    """The index of the damage type dealt by the combatants."""
+    damage_type: np.ndarray
+
+    """Boolean matrices of the immunities, vulnerabilities and resistances (fight x damage type)."""
+    immunities: np.ndarray
+    vulnerabilities: np.ndarray
+    resistances: np.ndarray
+
+    def __init__(self, characters: list[Character]):
+        """Collects the combat statistics of the specified characters."""
+        num_fights = len(characters)
+        num_damage_types = len(_DAMAGE_TYPE_INDEX)
+
+        self.hitpoints = np.empty(num_fights, dtype=np.int64)
+        self.armor_class = np.empty(num_fights, dtype=np.int64)
+        self.attack_modifier = np.empty(num_fights, dtype=np.int64)
+        self.damage_modifier = np.empty(num_fights, dtype=np.int64)
+        self.num_rolls = np.empty(num_fights, dtype=np.int64)
+        self.num_sides = np.empty(num_fights, dtype=np.int64)
+        self.fixed_damage = np.empty(num_fights, dtype=np.int64)
+        self.critical_fixed_damage = np.empty(num_fights, dtype=np.int64)
+        self.damage_type = np.empty(num_fights, dtype=np.int64)
+        self.immunities = np.zeros((num_fights, num_damage_types), dtype=bool)
+        self.vulnerabilities = np.zeros((num_fights, num_damage_types), dtype=bool)
+        self.resistances = np.zeros((num_fights, num_damage_types), dtype=bool)
+
+        # Characters sharing the same statistics (e.g. repeated fights) are only inspected once
+        rows = {}
+        for index, character in enumerate(characters):
+            if id(character) not in rows:
+                rows[id(character)] = self._character_row(character)
+            (self.hitpoints[index], self.armor_class[index], self.attack_modifier[index],
+             self.damage_modifier[index], self.num_rolls[index], self.num_sides[index],
+             self.fixed_damage[index], self.critical_fixed_damage[index],
+             self.damage_type[index], immunities, vulnerabilities, resistances) = rows[id(character)]
+            self.immunities[index, immunities] = True
+            self.vulnerabilities[index, vulnerabilities] = True
+            self.resistances[index, resistances] = True
+
+    @staticmethod
+    def _character_row(character: Character) -> tuple:
+        """Extracts the combat statistics of a character, following Character.roll_damage."""
+        weapon = character.equipped_weapon
+
+        ## Unarmed strikes deal a fix 1 + STR modifier damage, even on critical hits
+        if weapon is None:
+            num_rolls, num_sides, fixed, critical_fixed = 0, 1, 1, 1
+            damage_type = DamageType.BLUDGEONING
+
+        ## Weapons roll their damage twice on critical hits, including fix damage values
+        else:
+            damage_type = weapon.damage.type
+            value = weapon.damage._value
+            if isinstance(value, int):
+                num_rolls, num_sides, fixed, critical_fixed = 0, 1, value, 2 * value
+            else:
+                num_rolls, num_sides, fixed, critical_fixed = value.num_rolls, value.num_sides, 0, 0
+
+        return (character.hitpoints, character.armor_class, character.attack_modifier,
+                character.damage_modifier, num_rolls, num_sides, fixed, critical_fixed,
+                _DAMAGE_TYPE_INDEX[damage_type],
+                [_DAMAGE_TYPE_INDEX[t] for t in character.immunities],
+                [_DAMAGE_TYPE_INDEX[t] for t in character.vulnerabilities],
+                [_DAMAGE_TYPE_INDEX[t] for t in character.resistances])
+
+    @classmethod
+    def repeat(cls, character: Character, num_fights: int) -> CombatantArrays:
+        """Creates the arrays for the same character fighting in every duel."""
+        return cls([character] * num_fights)
+
+class DuelResults:
+    """The outcome of the duels simulated by the combat kernel."""
+
+    """Whether the first combatant won the fight."""
+    is_first_winner: np.ndarray
+
+    """Whether the fight ended before reaching the turn limit."""
+    is_finished: np.ndarray
+
+    """The number of attacks made during the fight."""
+    num_turns: np.ndarray
+
+    """The remaining hitpoints of the first and second combatant."""
+    first_hitpoints: np.ndarray
+    second_hitpoints: np.ndarray
+
+    def __init__(self, first_hitpoints: np.ndarray, second_hitpoints: np.ndarray,
+                 num_turns: np.ndarray):
+        self.first_hitpoints = first_hitpoints
+        self.second_hitpoints = second_hitpoints
+        self.num_turns = num_turns
+        self.is_finished = (first_hitpoints == 0) | (second_hitpoints == 0)
+        self.is_first_winner = self.is_finished & (first_hitpoints != 0)
+
+    @property
+    def first_win_rate(self) -> float:
+        """The ratio of finished fights won by the first combatant."""
+        return float(self.is_first_winner.sum() / max(1, self.is_finished.sum()))
+
+class CombatKernel:
+
+    @staticmethod
+    def roll_damage(source: CombatantArrays, fights: np.ndarray, is_critical: np.ndarray,
+                    rng: np.random.Generator) -> np.ndarray:
+        """Rolls the damage of the source combatants in the specified fights."""
+        num_rolls = source.num_rolls[fights] * np.where(is_critical, 2, 1)
+        max_rolls = int(num_rolls.max()) if num_rolls.size else 0
+        faces = rng.integers(1, source.num_sides[fights][:, None] + 1, size=(fights.size, max_rolls))
+        faces[np.arange(max_rolls) >= num_rolls[:, None]] = 0
+        fixed = np.where(is_critical, source.critical_fixed_damage[fights], source.fixed_damage[fights])
+        return faces.sum(axis=1) + fixed + source.damage_modifier[fights]
+
+    @staticmethod
+    def apply_damage_modifiers(target: CombatantArrays, fights: np.ndarray,
+                               damage_type: np.ndarray, damage: np.ndarray) -> np.ndarray:
+        """Applies the immunities, vulnerabilities and resistances of the targets, like Character.suffer_damage."""
+        damage = np.where(target.vulnerabilities[fights, damage_type], damage * 2,
+                          np.where(target.resistances[fights, damage_type], damage // 2, damage))
+        return np.where(target.immunities[fights, damage_type], 0, damage)
+
+    @classmethod
+    def simulate_duels(cls, first: CombatantArrays, second: CombatantArrays,
+                       rng: np.random.Generator = None, max_turns = 10000) -> DuelResults:
+        """
+        Simulates duels between the combatants of the same index until one
+        of them reaches zero hitpoints, the same way as simulation.simulate_fight.
+
+        The first combatants start every fight and the combatants attack
+        each other in turns. Fights are advanced together one attack at a
+        time, finished fights are masked out from the following turns.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        hitpoints = (first.hitpoints.copy(), second.hitpoints.copy())
+        num_turns = np.zeros(first.hitpoints.size, dtype=np.int64)
+        fights = np.flatnonzero((hitpoints[0] > 0) & (hitpoints[1] > 0))
+
+        turn = 0
+        while fights.size and turn < max_turns:
+            source, target = (first, second) if turn % 2 == 0 else (second, first)
+            target_hitpoints = hitpoints[1 - turn % 2]
+
+            ## A natural 20 is always a critical hit, otherwise the attack has to exceed the AC
+            attack_base = rng.integers(1, 21, size=fights.size)
+            is_critical = attack_base == 20
+            is_hit = is_critical | (attack_base + source.attack_modifier[fights] > target.armor_class[fights])
+
+            hit_fights = fights[is_hit]
+            damage = cls.roll_damage(source, hit_fights, is_critical[is_hit], rng)
+            damage = cls.apply_damage_modifiers(target, hit_fights, source.damage_type[hit_fights], damage)
+            target_hitpoints[hit_fights] = np.maximum(0, target_hitpoints[hit_fights] - damage)
+
+            num_turns[fights] += 1
+            fights = fights[target_hitpoints[fights] > 0]
+            turn += 1
+
+        return DuelResults(hitpoints[0], hitpoints[1], num_turns)
+
+    @classmethod
+    def simulate(cls, c1: Character, c2: Character, num_fights: int,
+                 rng: np.random.Generator = None) -> DuelResults:
+        """Simulates the specified number of duels between two characters, c1 starting."""
+        return cls.simulate_duels(CombatantArrays.repeat(c1, num_fights),
+                                  CombatantArrays.repeat(c2, num_fights), rng)
+
+    @classmethod
+    def compare_with_scalar(cls, c1: Character, c2: Character, num_fights: int,
+                            rng: np.random.Generator = None) -> dict[str, float]:
+        """
+        Simulates the duels both with the kernel and the scalar simulation path,
+        and returns the statistics of both for comparison. The 'win_rate_z_score'
+        entry is the difference between the win rates in standard errors, values
+        far from zero indicate that the kernel diverged from the scalar semantics.
+        """
+        results = cls.simulate(c1, c2, num_fights, rng)
+
+        scalar_wins = 0
+        scalar_turns = 0
+        for _ in range(num_fights):
+            first, second = copy.deepcopy(c1), copy.deepcopy(c2)
+            winner, _, num_turns = simulate_fight(first, second)
+            scalar_wins += winner is first
+            scalar_turns += num_turns
+
+        kernel_win_rate = results.first_win_rate
+        scalar_win_rate = scalar_wins / num_fights
+        pooled_win_rate = (kernel_win_rate + scalar_win_rate) / 2
+        standard_error = math.sqrt(max(pooled_win_rate * (1 - pooled_win_rate) * 2 / num_fights, 1e-12))
+        return {'kernel_win_rate': kernel_win_rate,
+                'scalar_win_rate': scalar_win_rate,
+                'kernel_mean_turns': float(results.num_turns.mean()),
+                'scalar_mean_turns': scalar_turns / num_fights,
+                'win_rate_z_score': (kernel_win_rate - scalar_win_rate) / standard_error}
@@ -0,0 +1,115 @@
+"""Structured event stream of combat and character events with pluggable sinks."""
+
+from __future__ import annotations
+from collections import deque
+from typing import ClassVar, TextIO
+import gzip
+import json
+import sys
+
+class EventSink:
+    """Base class for event sinks, receiving the events emitted by the EventLog."""
+
+    def emit(self, event: dict) -> None:
+        """Receives an event, a dictionary with at least an 'event' key naming its type."""
+        raise NotImplementedError()
+
+    def flush(self) -> None:
+        """Writes out the buffered events, if any."""
+        pass
+
+    def close(self) -> None:
+        """Flushes the buffered events and releases the resources of the sink."""
+        self.flush()
+
+class NullSink(EventSink):
+    """Sink discarding every event, used for benchmarks and by default."""
+
+    def emit(self, event: dict) -> None:
+        pass
+
+class RingBufferSink(EventSink):
+    """Sink keeping the most recent events in memory."""
+
+    def __init__(self, capacity = 10000):
+        self.events = deque(maxlen=capacity)
+
+    def emit(self, event: dict) -> None:
+        self.events.append(event)
+
+class JsonlFileSink(EventSink):
+    """
+    Sink writing the events as JSON lines into a file, optionally gzip compressed.
+    The events are buffered in memory and written out in large blocks.
+    """
+
+    def __init__(self, filename: str, compress = False, buffer_size = 1 << 20):
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self._file = gzip.open(filename, 'wt', encoding='utf-8') if compress \
+                     else open(filename, 'w', encoding='utf-8')
+        self._buffer = []
+        self._buffered_size = 0
+
+    def emit(self, event: dict) -> None:
+        line = json.dumps(event, separators=(',', ':'), default=str)
+        self._buffer.append(line)
+        self._buffered_size += len(line) + 1
+        if self._buffered_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._buffer.append('')
+            self._file.write('\n'.join(self._buffer))
+            self._buffer.clear()
+            self._buffered_size = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+class ConsoleSink(EventSink):
+    """Sink printing the events as human-readable lines."""
+
+    """Message templates for the known event types."""
+    MESSAGES = {
+        'fight_started': '======================================\n'
+                         'A new fight starts...\n'
+                         '======================================',
+        'fight_ended': '{winner} won the fight with {hitpoints} remaining HP.',
+        'attack': '{source} attacks {target} with a {weapon}.',
+        'hit': '{source} scored a {hit} on {target}! ({attack_roll} > {armor_class})',
+        'miss': '{source} missed ({attack_roll} <= {armor_class})',
+        'damage': '{target} suffered {damage} {damage_type} damage and is now on {hitpoints} HP.',
+        'experience_gained': '{character} gained {gained_experience} XP.',
+        'level_gained': '{character} levelled-up from {previous_level} to {reached_level}.',
+        'equipment_changed': '{character} {change} {item}.',
+    }
+
+    def __init__(self, stream: TextIO = None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def emit(self, event: dict) -> None:
+        if event['event'] == 'hit':
+            event = dict(event, hit='critical hit' if event['is_critical_hit'] else 'hit')
+        template = self.MESSAGES.get(event['event'])
+        message = template.format(**event) if template is not None else str(event)
+        print(message, file=self.stream)
+
+class EventLog:
+    """Global emitter of the structured events."""
+
+    """The sink currently receiving the events."""
+    sink: ClassVar[EventSink] = NullSink()
+
+    @classmethod
+    def set_sink(cls, sink: EventSink) -> EventSink:
+        """Replaces the current sink, returns the previous one."""
+        previous_sink, cls.sink = cls.sink, sink
+        return previous_sink
+
+    @classmethod
+    def emit(cls, event_type: str, **fields) -> None:
+        """Emits an event with the specified type and fields to the current sink."""
+        cls.sink.emit({'event': event_type, **fields})
@@ -0,0 +1,108 @@
+"""Compiled binary cache of the parsed content catalogs."""
+
+from __future__ import annotations
+from typing import Any, Callable, ClassVar
+import hashlib
+import os
+import pickle
+from metrics import REGISTRY
+
+CONTENT_CACHE_LOADS = REGISTRY.counter('content_cache_loads_total',
+                                       'Content files loaded through the content cache, by result (hit or miss).',
+                                       ('result',))
+
+def load_yaml(stream) -> Any:
+    """
+    Parses YAML with the fastest available safe loader (using libyaml when it
+    is installed). PyYAML is imported on first use, content served from the
+    cache not needing it.
+    """
+    import yaml
+    return yaml.load(stream, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+class ContentCache:
+    """
+    Cache of the fully parsed content files (e.g. the weapon and armor catalogs).
+
+    The parsed content is pickled next to the source file, together with the
+    modification time, size and SHA-256 hash of the source. The cache entry is
+    used as long as the modification time and size match, or the content hash
+    matches if only the modification time changed (e.g. after a checkout).
+    """
+
+    """Version of the cache format, bumped whenever the cached classes change."""
+    CACHE_VERSION: ClassVar[int] = 2
+
+    """Name of the cache directory, created next to the source files."""
+    CACHE_DIRECTORY: ClassVar[str] = '.cache'
+
+    @classmethod
+    def cache_filename(cls, source_filename: str) -> str:
+        """Returns the name of the cache file for the specified source file."""
+        directory, filename = os.path.split(source_filename)
+        return os.path.join(directory, cls.CACHE_DIRECTORY, f'{filename}.pickle')
+
+    @staticmethod
+    def _hash_file(filename: str) -> str:
+        with open(filename, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    @classmethod
+    def load(cls, source_filename: str, read_function: Callable[[str], Any]) -> Any:
+        """
+        Returns the parsed content of the source file from the cache, or parses it
+        with the read function and caches the result if the cache is out of date.
+        """
+        stat = os.stat(source_filename)
+        cache_filename = cls.cache_filename(source_filename)
+        content_hash = None
+
+        try:
+            with open(cache_filename, 'rb') as file:
+                header = pickle.load(file)
+                if header['version'] == cls.CACHE_VERSION:
+                    if (header['mtime'], header['size']) == (stat.st_mtime_ns, stat.st_size):
+                        content = pickle.load(file)
+                        CONTENT_CACHE_LOADS.labels('hit').inc()
+                        return content
+
+                    content_hash = cls._hash_file(source_filename)
+                    if header['hash'] == content_hash:
+                        content = pickle.load(file)
+                        cls._store(cache_filename, stat, content_hash, content)
+                        CONTENT_CACHE_LOADS.labels('hit').inc()
+                        return content
+
+        # A missing, truncated or incompatible cache file is rebuilt from the source
+        except (OSError, EOFError, KeyError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+            pass
+
+        CONTENT_CACHE_LOADS.labels('miss').inc()
+        content = read_function(source_filename)
+        cls._store(cache_filename, stat, content_hash or cls._hash_file(source_filename), content)
+        return content
+
+    @classmethod
+    def _store(cls, cache_filename: str, stat: os.stat_result, content_hash: str, content: Any) -> None:
+        """Atomically replaces the cache file with the specified content."""
+        header = {'version': cls.CACHE_VERSION, 'mtime': stat.st_mtime_ns,
+                  'size': stat.st_size, 'hash': content_hash}
+        try:
+            os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+            temporary_filename = f'{cache_filename}.{os.getpid()}.tmp'
+            with open(temporary_filename, 'wb') as file:
+                pickle.dump(header, file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(content, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_filename, cache_filename)
+
+        # Read-only content directories simply work without the cache
+        except OSError:
+            pass
+
+    @classmethod
+    def clear(cls, source_filename: str) -> None:
+        """Removes the cache file of the specified source file, if it exists."""
+        try:
+            os.remove(cls.cache_filename(source_filename))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,133 @@
+"""Lazily materialized catalogs of content items."""
+
+from __future__ import annotations
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator
+import re
+import textwrap
+from contentcache import ContentCache, load_yaml
+from metrics import REGISTRY
+
+CONTENT_LOOKUPS = REGISTRY.counter('content_lookups_total',
+                                   'Content item lookups, by catalog and result (hit if the item was already materialized).',
+                                   ('catalog', 'result'))
+
+class RegistryState:
+    """
+    Snapshot of a registry: the materialized items, the byte offsets of every
+    item and the file content they refer to (None if the items were populated).
+    """
+
+    def __init__(self, items: dict[str, Any], offsets: dict[str, tuple[int, int]], data: bytes | None):
+        self.items = items
+        self.offsets = offsets
+        self.data = data
+
+class ContentRegistry(Mapping):
+    """
+    Catalog of the content items of a YAML file, keyed by their ID.
+
+    Only the byte offsets of the items are indexed up-front by scanning the
+    file for their "- id: ..." lines, the items themselves are parsed and
+    materialized on first access. The whole catalog can be loaded eagerly
+    with warm_up(), which parses the file at once through the content cache.
+    """
+
+    """Regular expression matching the first line of every item."""
+    ITEM_PATTERN = re.compile(rb'^[ \t]*- id:[ \t]*([^\s#]+)', re.MULTILINE)
+
+    def __init__(self, filename: str, section: str,
+                 read_item: Callable[[dict], Any], read_file: Callable[[str], dict[str, Any]]):
+        """
+        Creates the registry of the specified file, without reading it yet.
+
+        The items are listed under the section key of the file, read_item
+        materializes one item from its descriptor, while read_file reads
+        every item of the file (used for the eager warm-up).
+        """
+        self.filename = filename
+        self.section = section
+        self._read_item = read_item
+        self._read_file = read_file
+        self._state = None
+        self._hits = CONTENT_LOOKUPS.labels(section, 'hit')
+        self._misses = CONTENT_LOOKUPS.labels(section, 'miss')
+
+    @classmethod
+    def _scan(cls, data: bytes) -> dict[str, tuple[int, int]]:
+        """Returns the (start, end) byte offsets of the items in the file content."""
+        matches = list(cls.ITEM_PATTERN.finditer(data))
+        ends = [match.start() for match in matches[1:]] + [len(data)]
+        return {match.group(1).decode(): (match.start(), end) for match, end in zip(matches, ends)}
+
+    def _current_state(self) -> RegistryState:
+        """Returns the state of the catalog, scanning the file if needed."""
+        state = self._state
+        if state is None:
+            with open(self.filename, 'rb') as file:
+                data = file.read()
+            state = self._state = RegistryState({}, self._scan(data), data)
+        return state
+
+    def __getitem__(self, item_id: str) -> Any:
+        # Reading the state once, a concurrent reload swaps in a new state
+        state = self._current_state()
+        item = state.items.get(item_id)
+        if item is not None:
+            self._hits.inc()
+        else:
+            self._misses.inc()
+            start, end = state.offsets[item_id]
+            block = textwrap.dedent(state.data[start:end].decode())
+            item = state.items[item_id] = self._read_item(load_yaml(block)[0])
+        return item
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._current_state().offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._current_state().offsets)
+
+    def __len__(self) -> int:
+        return len(self._current_state().offsets)
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether every item of the catalog is materialized."""
+        state = self._state
+        return state is not None and len(state.items) == len(state.offsets)
+
+    def populate(self, items: dict[str, Any]) -> None:
+        """Replaces the catalog with the specified materialized items."""
+        self._state = RegistryState(dict(items), {item_id: (0, 0) for item_id in items}, None)
+
+    def read_descriptors(self, data: bytes = None) -> dict[str, dict]:
+        """Parses the item descriptors of the file (or of its specified content) by their ID."""
+        if data is None:
+            with open(self.filename, 'rb') as file:
+                data = file.read()
+        return {desc['id']: desc for desc in load_yaml(data)[self.section]}
+
+    def swap(self, data: bytes, changed: dict[str, dict], removed: set[str]) -> None:
+        """
+        Atomically replaces the changed (added or modified) and the removed items
+        after the file was modified to the specified content. The changed items
+        are materialized from their descriptors, the unchanged materialized items
+        are kept and the remaining ones are materialized from the new content.
+        """
+        state = self._state
+        if state is None:
+            return
+
+        items = {item_id: item for item_id, item in state.items.items()
+                 if item_id not in changed and item_id not in removed}
+        items.update((item_id, self._read_item(desc)) for item_id, desc in changed.items())
+        if state.data is None:
+            self._state = RegistryState(items, {item_id: (0, 0) for item_id in items}, None)
+        else:
+            self._state = RegistryState(items, self._scan(data), data)
+
+    def warm_up(self, use_cache = True) -> None:
+        """Materializes every item of the catalog at once."""
+        self.populate(ContentCache.load(self.filename, self._read_file) if use_cache
+                      else self._read_file(self.filename))
@@ -0,0 +1,178 @@
+"""Hot reloading of the weapon and armor catalogs when their content files change."""
+
+from __future__ import annotations
+from typing import Callable, ClassVar
+import logging
+import os
+import threading
+import weakref
+import yaml
+from catalogquery import CatalogQuery
+from character import Character
+from combatlog import EventLog
+from contentregistry import ContentRegistry
+from gamecontroller import GameController
+from race import RaceRegistry
+
+"""The errors of reloading a content file while it is being edited: unreadable, not YAML or invalid items."""
+_RELOAD_ERRORS = (OSError, yaml.YAMLError, AssertionError, KeyError, TypeError, ValueError)
+
+class CatalogDiff:
+    """The IDs of the items added, removed and modified by a change of a content file."""
+
+    def __init__(self, added: set[str], removed: set[str], modified: set[str]):
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+    def __repr__(self) -> str:
+        return f'CatalogDiff(added={sorted(self.added)}, removed={sorted(self.removed)}, ' \
+               f'modified={sorted(self.modified)})'
+
+class WatchedCatalog:
+    """A catalog registry together with the file signature and the item descriptors last seen."""
+
+    def __init__(self, name: str, registry: ContentRegistry):
+        assert isinstance(registry, ContentRegistry), f'The {name} catalog is not backed by a content file'
+        self.name = name
+        self.registry = registry
+        self.signature = self.file_signature()
+        self.descriptors = registry.read_descriptors()
+
+    def file_signature(self) -> tuple[int, int]:
+        """Returns the modification time and the size of the content file."""
+        stat = os.stat(self.registry.filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self) -> CatalogDiff:
+        """
+        Re-parses the content file and diffs its items by ID against the last
+        seen descriptors. Only the added and modified items are materialized,
+        then swapped into the registry at once.
+        """
+        with open(self.registry.filename, 'rb') as file:
+            data = file.read()
+        descriptors = self.registry.read_descriptors(data)
+
+        diff = CatalogDiff(descriptors.keys() - self.descriptors.keys(),
+                           self.descriptors.keys() - descriptors.keys(),
+                           {item_id for item_id, desc in descriptors.items()
+                            if item_id in self.descriptors and desc != self.descriptors[item_id]})
+        if diff:
+            changed = {item_id: descriptors[item_id] for item_id in diff.added | diff.modified}
+            self.registry.swap(data, changed, diff.removed)
+        self.descriptors = descriptors
+        return diff
+
+class ContentWatcher:
+    """
+    Opt-in watcher of the content files of the GameController catalogs.
+
+    The files are polled for changes of their modification time or size,
+    either by calling poll() from the application loop or from a background
+    thread with start(). A changed file is re-parsed and only the items that
+    were added, removed or modified are swapped into the catalog, keeping the
+    other materialized items.
+
+    After a change the catalog indexes are invalidated, the armor class of the
+    tracked characters wearing a changed armor or shield is recalculated, and
+    the subscribers are notified with the catalog name and the diff.
+    """
+
+    logger: ClassVar[logging.Logger] = logging.getLogger('ContentWatcher')
+
+    def __init__(self, interval = 1.0):
+        self.interval = interval
+        self.catalogs = [WatchedCatalog('armors', GameController.armors),
+                         WatchedCatalog('weapons', GameController.weapons)]
+        self._characters = weakref.WeakSet()
+        self._subscribers = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def track(self, character: Character) -> None:
+        """Keeps the equipment derived state of the character up to date, until it is garbage collected."""
+        self._characters.add(character)
+
+    def untrack(self, character: Character) -> None:
+        self._characters.discard(character)
+
+    def subscribe(self, callback: Callable[[str, CatalogDiff], None]) -> None:
+        """Calls the callback with the catalog name and the diff after every change of a catalog."""
+        self._subscribers.append(callback)
+
+    def poll(self) -> dict[str, CatalogDiff]:
+        """Reloads the changed content files, returns the diffs of the changed catalogs."""
+        diffs = {}
+        for catalog in self.catalogs:
+            signature = catalog.file_signature()
+            if signature == catalog.signature:
+                continue
+
+            # A broken file (e.g. saved halfway) keeps the current catalog until it changes again
+            catalog.signature = signature
+            try:
+                diff = catalog.reload()
+            except _RELOAD_ERRORS as error:
+                self.logger.warning(f'Reloading the {catalog.name} catalog failed, keeping the current one',
+                                    exc_info=True)
+                EventLog.emit('content_reload_failed', catalog=catalog.name, error=str(error))
+                continue
+            if diff:
+                diffs[catalog.name] = diff
+
+        if diffs:
+            self._notify(diffs)
+        return diffs
+
+    def _notify(self, diffs: dict[str, CatalogDiff]) -> None:
+        CatalogQuery.invalidate()
+        if 'weapons' in diffs:
+            # Weapon proficiencies of the races are compiled from the weapon names
+            RaceRegistry.invalidate()
+
+        changed_ids = {name: diff.removed | diff.modified for name, diff in diffs.items()}
+        for character in list(self._characters):
+            armor_ids = changed_ids.get('armors', set())
+            if character.equipped_armor_id in armor_ids or character.equipped_shield_id in armor_ids:
+                character.update_armor_class()
+            if character.equipped_weapon_id in changed_ids.get('weapons', set()) \
+               and character.equipped_weapon_id not in GameController.weapons:
+                character.equipped_weapon_id = ''
+
+        for name, diff in diffs.items():
+            EventLog.emit('content_reloaded', catalog=name, added=sorted(diff.added),
+                          removed=sorted(diff.removed), modified=sorted(diff.modified))
+            for callback in self._subscribers:
+                callback(name, diff)
+
+    ## Background polling
+    ## ==================
+
+    def start(self) -> None:
+        """Starts polling the content files in a daemon thread."""
+        assert self._thread is None, 'The watcher is already running'
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ContentWatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the polling thread and waits for it to finish."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def __enter__(self) -> ContentWatcher:
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from enum import Enum
+from functools import lru_cache
 import re
+import weakref
 
 class CurrencyType(Enum):
     COPPER = 0,
@@ -10,6 +12,12 @@ class CurrencyType(Enum):
     PLATINUM = 4
 
 class Currency:
+    """
+    Immutable amount of money. Instances are interned: constructing a currency
+    returns the existing instance with the same value, if there is one.
+    """
+
+    __slots__ = ('value', '__weakref__')
 
     """The value of the currency (copper equivalent)."""
     value: int
@@ -17,22 +25,53 @@ class Currency:
     """Regular expression for validating currencies."""
     REGEX_PATTERN = r'^(\d+)\s(sp|gp|ep|cp|pp)$'
 
-    def __init__(self, amount: int, type = CurrencyType.COPPER):
+    """The interned instances by their value."""
+    _instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, amount: int, type = CurrencyType.COPPER):
         match type:
             case CurrencyType.COPPER:
-                self.value = amount
+                value = amount
             case CurrencyType.SILVER:
-                self.value = amount * 10
+                value = amount * 10
             case CurrencyType.ELECTRUM:
-                self.value = amount * 50
+                value = amount * 50
             case CurrencyType.GOLD:
-                self.value = amount * 100
+                value = amount * 100
             case CurrencyType.PLATINUM:
-                self.value = amount * 1000
+                value = amount * 1000
             case _:
                 raise AssertionError(f'Unrecognized currency type: "{type}"')
 
+        instance = cls._instances.get(value)
+        if instance is None:
+            instance = super().__new__(cls)
+            object.__setattr__(instance, 'value', value)
+            instance = cls._instances.setdefault(value, instance)
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, Currency):
+            return NotImplemented
+        return self.value == other.value
+
+    def __hash__(self) -> int:
+        return hash(self.value)
+
+    def __reduce__(self):
+        # Unpickled currencies are interned as well
+        return type(self), (self.value,)
+
+    def __repr__(self) -> str:
+        return f'Currency({self.value} cp)'
+
     @classmethod
+    @lru_cache(maxsize=1024)
     def from_string(cls, currency_str: str) -> Currency:
         re_match = re.match(cls.REGEX_PATTERN, currency_str)
         if re_match:
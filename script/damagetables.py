@@ -0,0 +1,212 @@
+"""Precomputed expected damage per round of every weapon against ranges of targets."""
+
+from __future__ import annotations
+from collections.abc import Mapping
+from enum import Enum
+import argparse
+import os
+import numpy as np
+from character import Character
+from fightsolver import dice_distribution
+from gamecontroller import GameController
+from weapon import Weapon
+
+class AttackMode(Enum):
+    """Whether the attack roll is made normally, with advantage or with disadvantage."""
+    NORMAL = 0
+    ADVANTAGE = 1
+    DISADVANTAGE = 2
+
+def face_probabilities(mode: AttackMode) -> np.ndarray:
+    """Returns the probability of every kept d20 face (index 1-20) of an attack roll."""
+    faces = np.arange(21, dtype=np.float64)
+    if mode == AttackMode.ADVANTAGE:
+        probabilities = (faces ** 2 - (faces - 1) ** 2) / 400
+    elif mode == AttackMode.DISADVANTAGE:
+        probabilities = ((21 - faces) ** 2 - (20 - faces) ** 2) / 400
+    else:
+        probabilities = np.full(21, 1 / 20)
+    probabilities[0] = 0.0
+    return probabilities
+
+def hit_probability_table(attack_modifiers: np.ndarray, armor_classes: np.ndarray,
+                          mode: AttackMode) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the probability of a normal and of a critical hit for every attack
+    modifier and armor class pair (modifier x AC), like Character.roll_attack:
+    a natural 20 is a critical hit, otherwise the attack roll has to exceed the AC.
+    """
+    probabilities = face_probabilities(mode)
+    at_least = np.cumsum(probabilities[::-1])[::-1]  # at_least[face] = P(kept face >= face)
+
+    # The smallest face hitting without a critical, capped to the range of the table
+    min_face = np.clip(armor_classes[None, :] - attack_modifiers[:, None] + 1, 1, 20)
+    normal_hit = at_least[min_face] - probabilities[20]
+    critical_hit = np.full_like(normal_hit, probabilities[20])
+    return normal_hit, critical_hit
+
+def expected_damage_on_hit(weapon: Weapon, damage_modifiers: np.ndarray,
+                           is_critical: bool) -> np.ndarray:
+    """
+    Returns the expected damage of a hit for every damage modifier, like
+    Character.roll_damage: critical hits roll the weapon damage twice and add
+    the modifier once. Like there, the damage is not clamped at 0.
+    """
+    value = weapon.damage._value
+    num_damage_rolls = 2 if is_critical else 1
+    if isinstance(value, int):
+        damages, probabilities = np.array([num_damage_rolls * value]), np.array([1.0])
+    else:
+        distribution = dice_distribution(num_damage_rolls * value.num_rolls, value.num_sides)
+        damages = np.array([damage for damage, _ in distribution])
+        probabilities = np.array([probability for _, probability in distribution])
+    return ((damages[None, :] + damage_modifiers[:, None]) * probabilities).sum(axis=1)
+
+def weapon_fingerprint(weapon: Weapon) -> str:
+    """Identifies the attributes of the weapon the expected damage depends on."""
+    return repr(weapon.damage)
+
+class DamageTable:
+    """
+    Expected damage per attack of every weapon, indexed by
+    [weapon, armor class, ability modifier, proficiency bonus, attack mode].
+
+    The ability modifier is added to both the attack and the damage rolls, the
+    proficiency bonus (0 when not proficient) only to the attack rolls.
+    """
+
+    """Version of the table file format, bumped whenever the computed values change."""
+    FILE_VERSION = 2
+
+    def __init__(self, weapon_ids: list[str], fingerprints: list[str], armor_classes: range,
+                 modifiers: range, proficiency_bonuses: list[int], expected_damage: np.ndarray):
+        self.weapon_ids = list(weapon_ids)
+        self.fingerprints = list(fingerprints)
+        self.armor_classes = armor_classes
+        self.modifiers = modifiers
+        self.proficiency_bonuses = list(proficiency_bonuses)
+        self.expected_damage = expected_damage
+        self._weapon_index = {weapon_id: index for index, weapon_id in enumerate(self.weapon_ids)}
+        self._proficiency_index = {bonus: index for index, bonus in enumerate(self.proficiency_bonuses)}
+
+    @property
+    def axes(self) -> tuple:
+        """The ranges of the table besides the weapons, tables with equal axes are compatible."""
+        return (self.armor_classes.start, self.armor_classes.stop, self.modifiers.start,
+                self.modifiers.stop, tuple(self.proficiency_bonuses))
+
+    def lookup(self, weapon_id: str, armor_class: int, modifier: int, proficiency_bonus: int,
+               mode = AttackMode.NORMAL) -> float:
+        """Returns the expected damage of an attack with the weapon."""
+        return float(self.expected_damage[self._weapon_index[weapon_id],
+                                          armor_class - self.armor_classes.start,
+                                          modifier - self.modifiers.start,
+                                          self._proficiency_index[proficiency_bonus],
+                                          mode.value])
+
+    def lookup_character(self, character: Character, armor_class: int, mode = AttackMode.NORMAL) -> float:
+        """Returns the expected damage of an attack of the character with its equipped weapon."""
+        assert character.equipped_weapon is not None, 'Unarmed strikes are not tabulated'
+        modifier = character.damage_modifier
+        return self.lookup(character.equipped_weapon_id, armor_class, modifier,
+                           character.attack_modifier - modifier, mode)
+
+    ## Building
+    ## ========
+
+    @classmethod
+    def build(cls, weapons: Mapping[str, Weapon] = None, armor_classes = range(10, 26),
+              modifiers = range(-5, 11), proficiency_bonuses = (0, 2, 3, 4, 5, 6),
+              previous: DamageTable = None) -> DamageTable:
+        """
+        Computes the table for the weapons (the GameController catalog by default).
+        The rows of weapons whose damage did not change are reused from the
+        previous table, if its axes are the same.
+        """
+        weapons = weapons if weapons is not None else GameController.weapons
+        weapon_ids = sorted(weapons)
+        fingerprints = [weapon_fingerprint(weapons[weapon_id]) for weapon_id in weapon_ids]
+        table = cls(weapon_ids, fingerprints, armor_classes, modifiers, proficiency_bonuses,
+                    np.empty((len(weapon_ids), len(armor_classes), len(modifiers),
+                              len(proficiency_bonuses), len(AttackMode)), dtype=np.float32))
+
+        reusable = previous is not None and previous.axes == table.axes
+        for index, (weapon_id, fingerprint) in enumerate(zip(weapon_ids, fingerprints)):
+            previous_index = previous._weapon_index.get(weapon_id) if reusable else None
+            if previous_index is not None and previous.fingerprints[previous_index] == fingerprint:
+                table.expected_damage[index] = previous.expected_damage[previous_index]
+            else:
+                table.expected_damage[index] = table._weapon_rows(weapons[weapon_id])
+        return table
+
+    def _weapon_rows(self, weapon: Weapon) -> np.ndarray:
+        """Computes the expected damage of the weapon (AC x modifier x proficiency x mode)."""
+        armor_classes = np.array(self.armor_classes)
+        modifiers = np.array(self.modifiers)
+        normal_damage = expected_damage_on_hit(weapon, modifiers, is_critical=False)
+        critical_damage = expected_damage_on_hit(weapon, modifiers, is_critical=True)
+
+        rows = np.empty((len(armor_classes), len(modifiers), len(self.proficiency_bonuses), len(AttackMode)))
+        for proficiency_index, bonus in enumerate(self.proficiency_bonuses):
+            for mode in AttackMode:
+                normal_hit, critical_hit = hit_probability_table(modifiers + bonus, armor_classes, mode)
+                rows[:, :, proficiency_index, mode.value] = (normal_hit * normal_damage[:, None]
+                                                             + critical_hit * critical_damage[:, None]).T
+        return rows
+
+    ## Storage
+    ## =======
+
+    def save(self, filename: str) -> None:
+        """Atomically writes the table into a compressed array file."""
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        temporary_filename = f'{filename}.{os.getpid()}.tmp.npz'
+        np.savez_compressed(temporary_filename, version=self.FILE_VERSION,
+                            weapon_ids=np.array(self.weapon_ids), fingerprints=np.array(self.fingerprints),
+                            armor_classes=np.array([self.armor_classes.start, self.armor_classes.stop]),
+                            modifiers=np.array([self.modifiers.start, self.modifiers.stop]),
+                            proficiency_bonuses=np.array(self.proficiency_bonuses),
+                            expected_damage=self.expected_damage)
+        os.replace(temporary_filename, filename)
+
+    @classmethod
+    def load(cls, filename: str) -> DamageTable:
+        """Reads a table written by save()."""
+        with np.load(filename, allow_pickle=False) as arrays:
+            assert int(arrays['version']) == cls.FILE_VERSION, f'Unsupported damage table version: "{filename}"'
+            return cls(arrays['weapon_ids'].tolist(), arrays['fingerprints'].tolist(),
+                       range(*arrays['armor_classes'].tolist()), range(*arrays['modifiers'].tolist()),
+                       arrays['proficiency_bonuses'].tolist(), arrays['expected_damage'])
+
+    @classmethod
+    def update(cls, filename: str, weapons: Mapping[str, Weapon] = None, **axes) -> DamageTable:
+        """
+        Loads the table from the file and rebuilds it for the changed weapons,
+        writing it back if anything changed. A missing, outdated or unreadable
+        file is rebuilt from scratch.
+        """
+        try:
+            previous = cls.load(filename)
+        except (OSError, KeyError, ValueError, AssertionError):
+            previous = None
+
+        table = cls.build(weapons, previous=previous, **axes)
+        if previous is None or previous.axes != table.axes or previous.weapon_ids != table.weapon_ids \
+           or previous.fingerprints != table.fingerprints:
+            table.save(filename)
+        return table
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds the expected damage tables of the weapon catalog.')
+    parser.add_argument('-o', '--output', default='content/.cache/damage_tables.npz',
+                        help='the table file, updated incrementally if it exists')
+    parser.add_argument('--armor-classes', type=int, nargs=2, default=[10, 25], metavar=('MIN', 'MAX'))
+    parser.add_argument('--modifiers', type=int, nargs=2, default=[-5, 10], metavar=('MIN', 'MAX'))
+    parser.add_argument('--proficiency-bonuses', type=int, nargs='+', default=[0, 2, 3, 4, 5, 6])
+    args = parser.parse_args()
+
+    table = DamageTable.update(args.output,
+                               armor_classes=range(args.armor_classes[0], args.armor_classes[1] + 1),
+                               modifiers=range(args.modifiers[0], args.modifiers[1] + 1),
+                               proficiency_bonuses=tuple(args.proficiency_bonuses))
+    print(f'{len(table.weapon_ids)} weapons, {table.expected_damage.size} entries: {args.output}')
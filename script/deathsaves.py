@@ -0,0 +1,171 @@
+"""Exact outcome probabilities of the death saving throws of dying characters."""
+
+from __future__ import annotations
+from enum import Enum
+import functools
+import random
+import numpy as np
+from character import Character, Condition
+
+class DeathSaveResult(Enum):
+    """The final result of a character dying at zero hitpoints."""
+    DEAD = 0
+    STABLE = 1
+    REVIVED = 2
+
+class DeathSaveOutcome:
+    """The absorption probabilities of the death save process from one state."""
+
+    """The probability of dying, of becoming stable and of regaining a hitpoint by a natural 20."""
+    dead: float
+    stable: float
+    revived: float
+
+    """The expected number of rounds until one of the results."""
+    expected_rounds: float
+
+    def __init__(self, dead: float, stable: float, revived: float, expected_rounds: float):
+        self.dead = dead
+        self.stable = stable
+        self.revived = revived
+        self.expected_rounds = expected_rounds
+
+    @property
+    def probabilities(self) -> tuple[float, float, float]:
+        """The probabilities of the results, in the order of DeathSaveResult."""
+        return self.dead, self.stable, self.revived
+
+    def __repr__(self) -> str:
+        return f'DeathSaveOutcome(dead={self.dead:.6f}, stable={self.stable:.6f}, ' \
+               f'revived={self.revived:.6f}, expected_rounds={self.expected_rounds:.4f})'
+
+"""The transient states: (successes, failures) pairs, followed by being stable while still attacked."""
+_STATES = [(successes, failures) for successes in range(3) for failures in range(3)]
+_STABLE_STATE = len(_STATES)
+
+"""Probability of the death save results of Character.roll_death_save (PH. 197)."""
+_DOUBLE_FAILURE = 1 / 20  # Natural 1
+_FAILURE = 8 / 20         # 2-9
+_SUCCESS = 10 / 20        # 10-19
+_REVIVAL = 1 / 20         # Natural 20
+
+@functools.lru_cache(maxsize=256)
+def _absorption_table(hit_probability: float, critical_probability: float,
+                      instant_death_probability: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Solves the absorbing Markov chain of one round: a death save of the
+    character, followed by the attacks against it. Returns the absorption
+    probabilities (state x result) and the expected rounds of every state.
+
+    Damage at zero hitpoints counts as one failed save (two for critical hits)
+    and ends being stable, like Character.suffer_damage. While attacks keep
+    coming, being stable is therefore not final but a state of the chain.
+    """
+    is_attacked = hit_probability + critical_probability + instant_death_probability > 0
+    num_states = len(_STATES) + (1 if is_attacked else 0)
+    transient = np.zeros((num_states, num_states))
+    absorbing = np.zeros((num_states, len(DeathSaveResult)))
+    miss_probability = 1.0 - hit_probability - critical_probability - instant_death_probability
+    assert miss_probability >= -1e-12, 'The attack probabilities exceed one'
+
+    def attacked(state: int, successes: int, failures: int, probability: float) -> None:
+        """Adds the transitions of the attacks after the save, from the specified counters."""
+        if not is_attacked:
+            transient[state, _STATES.index((successes, failures))] += probability
+            return
+        absorbing[state, DeathSaveResult.DEAD.value] += probability * instant_death_probability
+        for added_failures, chance in ((0, miss_probability), (1, hit_probability), (2, critical_probability)):
+            if failures + added_failures >= 3:
+                absorbing[state, DeathSaveResult.DEAD.value] += probability * chance
+            else:
+                transient[state, _STATES.index((successes, failures + added_failures))] += probability * chance
+
+    def stabilized(state: int, probability: float) -> None:
+        """Adds the transitions of becoming stable, the counters are reset."""
+        if not is_attacked:
+            absorbing[state, DeathSaveResult.STABLE.value] += probability
+            return
+        absorbing[state, DeathSaveResult.DEAD.value] += probability * instant_death_probability
+        transient[state, _STABLE_STATE] += probability * miss_probability
+        transient[state, _STATES.index((0, 1))] += probability * hit_probability
+        transient[state, _STATES.index((0, 2))] += probability * critical_probability
+
+    for state, (successes, failures) in enumerate(_STATES):
+        absorbing[state, DeathSaveResult.REVIVED.value] += _REVIVAL
+        for added_failures, chance in ((2, _DOUBLE_FAILURE), (1, _FAILURE)):
+            if failures + added_failures >= 3:
+                absorbing[state, DeathSaveResult.DEAD.value] += chance
+            else:
+                attacked(state, successes, failures + added_failures, chance)
+        if successes + 1 == 3:
+            stabilized(state, _SUCCESS)
+        else:
+            attacked(state, successes + 1, failures, _SUCCESS)
+
+    # Stable characters do not roll death saves, only the attacks change their state
+    if is_attacked:
+        stabilized(_STABLE_STATE, 1.0)
+
+    fundamental = np.linalg.inv(np.eye(num_states) - transient)
+    return fundamental @ absorbing, fundamental.sum(axis=1)
+
+def death_save_outcome(successes = 0, failures = 0, hit_probability = 0.0, critical_probability = 0.0,
+                       instant_death_probability = 0.0, is_stable = False) -> DeathSaveOutcome:
+    """
+    Returns the exact outcome of the death saves of a character at zero
+    hitpoints, starting on its turn with the specified counters.
+
+    The attack probabilities describe what happens to the character every
+    round after its save: a normal hit, a critical hit or a hit dealing at
+    least the maximum hitpoints (instant death). Without attacks a character
+    becoming stable stays stable, with attacks the only results are dying or
+    reviving by a natural 20.
+    """
+    assert 0 <= successes < 3 and 0 <= failures < 3, f'Invalid death save counters: {successes}, {failures}'
+    probabilities, expected_rounds = _absorption_table(hit_probability, critical_probability,
+                                                       instant_death_probability)
+    if is_stable:
+        if len(expected_rounds) == len(_STATES):
+            return DeathSaveOutcome(0.0, 1.0, 0.0, 0.0)
+        state = _STABLE_STATE
+    else:
+        state = _STATES.index((successes, failures))
+    return DeathSaveOutcome(*probabilities[state].tolist(), float(expected_rounds[state]))
+
+def character_outcome(character: Character, hit_probability = 0.0, critical_probability = 0.0,
+                      instant_death_probability = 0.0) -> DeathSaveOutcome:
+    """Returns the exact outcome of the death saves of the character in its current state."""
+    return death_save_outcome(character.num_death_save_success, character.num_death_save_failure,
+                              hit_probability, critical_probability, instant_death_probability,
+                              Condition.STABLE in character.active_conditions)
+
+def sample_results(outcome: DeathSaveOutcome, num_samples: int,
+                   rng: np.random.Generator = None) -> np.ndarray:
+    """Samples the results (DeathSaveResult values) of many characters in the same state at once."""
+    rng = rng if rng is not None else np.random.default_rng()
+    probabilities = np.array(outcome.probabilities)
+    return rng.choice(len(DeathSaveResult), size=num_samples, p=probabilities / probabilities.sum())
+
+def resolve(character: Character, hit_probability = 0.0, critical_probability = 0.0,
+            instant_death_probability = 0.0, rng: random.Random = None) -> DeathSaveResult:
+    """
+    Resolves the death saves of the dying character in one step, drawing the
+    result from the exact outcome and applying it like Character.roll_death_save.
+    """
+    outcome = character_outcome(character, hit_probability, critical_probability, instant_death_probability)
+    result, = (rng or random).choices(list(DeathSaveResult), weights=outcome.probabilities)
+
+    match result:
+        case DeathSaveResult.DEAD:
+            raise NotImplementedError('The character should die.')
+        case DeathSaveResult.STABLE:
+            character.active_conditions.add(Condition.STABLE)
+            character.num_death_save_success = 0
+            character.num_death_save_failure = 0
+        case DeathSaveResult.REVIVED:
+            character.active_conditions.discard(Condition.UNCONSCIOUS)
+            character.active_conditions.discard(Condition.STABLE)
+            character.num_death_save_success = 0
+            character.num_death_save_failure = 0
+            character.heal(1)
+    return result
@@ -1,12 +1,28 @@
 from __future__ import annotations
+from functools import lru_cache
 import random
 import re
+import weakref
+from metrics import REGISTRY
+
+DICE_ROLLED = REGISTRY.counter('dice_rolled_total', 'Dice rolled, by number of sides.', ('sides',))
+
+"""The counters of DICE_ROLLED by number of sides, resolved once (prebuilt for the standard dice)."""
+_DICE_ROLLED_BY_SIDES = {num_sides: DICE_ROLLED.labels(num_sides) for num_sides in (4, 6, 8, 10, 12, 20, 100)}
 
 class Dice:
 
+    """The random generator of the rolls, replaceable e.g. for recording or replaying the draws."""
+    rng = random
+
     @staticmethod
     def roll(num_rolls: int, num_sides: int) -> int:
-        return sum([random.randint(1, num_sides) for _ in range(num_rolls)])
+        try:
+            counter = _DICE_ROLLED_BY_SIDES[num_sides]
+        except KeyError:
+            counter = _DICE_ROLLED_BY_SIDES[num_sides] = DICE_ROLLED.labels(num_sides)
+        counter.inc(num_rolls)
+        return sum([Dice.rng.randint(1, num_sides) for _ in range(num_rolls)])
 
     @classmethod
     def roll_advantage(cls, num_rolls: int, num_sides: int) -> int:
@@ -19,7 +35,13 @@ class Dice:
                    cls.roll(num_rolls, num_sides))
 
 class DiceRoll:
-    
+    """
+    Immutable dice roll. Instances are interned: constructing a dice roll
+    returns the existing instance with the same dice, if there is one.
+    """
+
+    __slots__ = ('num_rolls', 'num_sides', '__weakref__')
+
     """The number of rolls for the dice."""
     num_rolls: int
 
@@ -29,9 +51,38 @@ class DiceRoll:
     """Regular expression for validating dice rolls."""
     REGEX_PATTERN = r'^(\d{1,2})[dD](4|6|8|10|12|20|100)$'
 
-    def __init__(self, num_rolls: int, num_sides: int):
-        self.num_rolls = num_rolls
-        self.num_sides = num_sides
+    """The interned instances by their dice."""
+    _instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, num_rolls: int, num_sides: int):
+        key = (num_rolls, num_sides)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = super().__new__(cls)
+            object.__setattr__(instance, 'num_rolls', num_rolls)
+            object.__setattr__(instance, 'num_sides', num_sides)
+            instance = cls._instances.setdefault(key, instance)
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, DiceRoll):
+            return NotImplemented
+        return (self.num_rolls, self.num_sides) == (other.num_rolls, other.num_sides)
+
+    def __hash__(self) -> int:
+        return hash((self.num_rolls, self.num_sides))
+
+    def __reduce__(self):
+        # Unpickled dice rolls are interned as well
+        return type(self), (self.num_rolls, self.num_sides)
+
+    def __repr__(self) -> str:
+        return f'DiceRoll({self.to_string()})'
 
     def roll(self) -> int:
         return Dice.roll(self.num_rolls, self.num_sides)
@@ -46,7 +97,8 @@ class DiceRoll:
         return f'{self.num_rolls}d{self.num_sides}'
     
     @classmethod
-    def from_string(cls, dice_str: str) -> Dice:
+    @lru_cache(maxsize=1024)
+    def from_string(cls, dice_str: str) -> DiceRoll:
         match = re.match(cls.REGEX_PATTERN, dice_str)
         if match:
             return DiceRoll(int(match.group(1)), int(match.group(2)))
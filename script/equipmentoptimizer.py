@@ -0,0 +1,271 @@
+"""Search of the best armor, shield and weapon combinations for a character."""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import copy
+import io
+import os
+from armor import ArmorType
+from character import Character, Ability
+from currency import Currency, CurrencyType
+from fightsolver import FightSolver, attack_distribution, damage_distribution, suffered_damage
+from gamecontroller import GameController
+from weapon import DamageType
+import rules.armorclass  # Registers the armor class rules used for the effective AC
+
+"""The objectives builds can be optimized for, all of them are maximized."""
+OBJECTIVES = ('expected_damage', 'armor_class', 'win_probability')
+
+class Build:
+    """An equipment combination of a character and its evaluation. Empty IDs stand for no item."""
+
+    def __init__(self, armor_id: str, shield_id: str, weapon_id: str, cost: int, weight: float,
+                 armor_class: int, speed: int, has_stealth_disadvantage: bool, expected_damage: float):
+        self.armor_id = armor_id
+        self.shield_id = shield_id
+        self.weapon_id = weapon_id
+        self.cost = cost
+        self.weight = weight
+        self.armor_class = armor_class
+        self.speed = speed
+        self.has_stealth_disadvantage = has_stealth_disadvantage
+        self.expected_damage = expected_damage
+        self.win_probability = None
+
+    def dominates(self, other: Build, objectives: tuple[str, ...]) -> bool:
+        """Whether the build is at least as good in every objective, cost and weight, and better in one."""
+        values = [getattr(self, objective) for objective in objectives] + [-self.cost, -self.weight]
+        other_values = [getattr(other, objective) for objective in objectives] + [-other.cost, -other.weight]
+        return all(value >= other_value for value, other_value in zip(values, other_values)) \
+               and values != other_values
+
+    def __repr__(self) -> str:
+        win_probability = f', win_probability={self.win_probability:.4f}' \
+                          if self.win_probability is not None else ''
+        return f'Build(armor="{self.armor_id}", shield="{self.shield_id}", weapon="{self.weapon_id}", ' \
+               f'cost={self.cost}, weight={self.weight}, armor_class={self.armor_class}, ' \
+               f'expected_damage={self.expected_damage:.4f}{win_probability})'
+
+class DefenseOption:
+    """An armor and shield combination with its effect on the character."""
+
+    def __init__(self, armor_id: str, shield_id: str, cost: int, weight: float,
+                 armor_class: int, speed: int, has_stealth_disadvantage: bool):
+        self.armor_id = armor_id
+        self.shield_id = shield_id
+        self.cost = cost
+        self.weight = weight
+        self.armor_class = armor_class
+        self.speed = speed
+        self.has_stealth_disadvantage = has_stealth_disadvantage
+
+    def dominates(self, other: DefenseOption) -> bool:
+        """Whether the option is at least as good in every respect (ties dominate too)."""
+        return self.armor_class >= other.armor_class and self.cost <= other.cost \
+               and self.weight <= other.weight and self.speed >= other.speed \
+               and self.has_stealth_disadvantage <= other.has_stealth_disadvantage
+
+class WeaponOption:
+    """A weapon (or an unarmed strike) with the exact distributions of its attacks."""
+
+    def __init__(self, weapon_id: str, cost: int, weight: float, attack_modifier: int,
+                 hit_losses: dict[int, float], critical_losses: dict[int, float], expected_damage: float):
+        self.weapon_id = weapon_id
+        self.cost = cost
+        self.weight = weight
+        self.attack_modifier = attack_modifier
+        self.hit_losses = hit_losses
+        self.critical_losses = critical_losses
+        self.expected_damage = expected_damage
+
+    @staticmethod
+    def _stochastically_dominates(first: dict[int, float], second: dict[int, float]) -> bool:
+        """Whether the first distribution is at least as large as the second one at every quantile."""
+        first_cumulative = second_cumulative = 0.0
+        for value in sorted(first.keys() | second.keys()):
+            first_cumulative += first.get(value, 0.0)
+            second_cumulative += second.get(value, 0.0)
+            if first_cumulative > second_cumulative + 1e-12:
+                return False
+        return True
+
+    def dominates(self, other: WeaponOption) -> bool:
+        """
+        Whether the weapon is at least as good in every respect (ties dominate too):
+        it hits at least as often and its damage is stochastically at least as large,
+        so it is at least as good for any objective.
+        """
+        return self.attack_modifier >= other.attack_modifier and self.cost <= other.cost \
+               and self.weight <= other.weight \
+               and self._stochastically_dominates(self.hit_losses, other.hit_losses) \
+               and self._stochastically_dominates(self.critical_losses, other.critical_losses)
+
+def prune_dominated(options: list) -> list:
+    """Removes the options dominated by another one, keeping the first of equal options."""
+    kept = []
+    for option in options:
+        if any(other.dominates(option) for other in kept):
+            continue
+        kept = [other for other in kept if not option.dominates(other)]
+        kept.append(option)
+    return kept
+
+"""The character and the opponent of the pool worker processes."""
+_worker_duelists = None
+
+def _initialize_worker(character: Character, opponent: Character) -> None:
+    global _worker_duelists
+    _worker_duelists = (character, opponent)
+
+def _solve_win_probability(task: tuple[str, int]) -> float:
+    """Returns the win probability of the character with the weapon and armor class against the opponent."""
+    weapon_id, armor_class = task
+    character, opponent = _worker_duelists
+    character.equipped_weapon_id = weapon_id
+    character.armor_class = armor_class
+    return FightSolver.solve(character, opponent).win_probability
+
+class EquipmentOptimizer:
+    """
+    Searches every armor, shield and weapon combination of the catalog for a
+    character and returns the Pareto front of the builds: the builds no other
+    build beats in every objective, the cost and the weight.
+
+    The effective armor class is calculated by the armor class rules, the
+    speed penalty of heavy armor and the stealth disadvantage are reported and
+    can be excluded. The expected damage per round and the win probability of
+    a duel (the character attacking first) are exact, computed from the damage
+    distributions. Items dominated by another item are pruned before combining
+    them, the duels are solved in a process pool.
+    """
+
+    def __init__(self, character: Character, opponent: Character = None, target_armor_class = 13,
+                 objectives = ('expected_damage', 'armor_class'), cost_budget: Currency = None,
+                 weight_budget: float = None, allow_speed_penalty = True,
+                 allow_stealth_disadvantage = True, max_workers: int = None):
+        """
+        The expected damage is calculated against the opponent, or against a
+        target with the specified armor class if there is no opponent. The
+        opponent is required for the win probability objective.
+        """
+        assert all(objective in OBJECTIVES for objective in objectives), f'Unknown objectives: {objectives}'
+        assert 'win_probability' not in objectives or opponent is not None, \
+               'The win probability objective requires an opponent'
+        self.character = copy.deepcopy(character)
+        self.opponent = opponent
+        if opponent is None:
+            self.target = Character()
+            self.target.armor_class = target_armor_class
+        else:
+            self.target = opponent
+        self.objectives = tuple(objectives)
+        self.cost_budget = cost_budget.value if cost_budget is not None else None
+        self.weight_budget = weight_budget
+        self.allow_speed_penalty = allow_speed_penalty
+        self.allow_stealth_disadvantage = allow_stealth_disadvantage
+        self.max_workers = max_workers
+
+    def _is_within_budget(self, cost: int, weight: float) -> bool:
+        return (self.cost_budget is None or cost <= self.cost_budget) \
+               and (self.weight_budget is None or weight <= self.weight_budget)
+
+    def defense_options(self) -> list[DefenseOption]:
+        """Returns the allowed armor and shield combinations within the budget, without the dominated ones."""
+        armors = GameController.armors
+        armor_ids = [''] + [armor_id for armor_id, armor in armors.items() if armor.type != ArmorType.SHIELD]
+        shield_ids = [''] + [armor_id for armor_id, armor in armors.items() if armor.type == ArmorType.SHIELD]
+
+        options = []
+        character = copy.deepcopy(self.character)
+        for armor_id in armor_ids:
+            for shield_id in shield_ids:
+                items = [armors[item_id] for item_id in (armor_id, shield_id) if item_id]
+                cost = sum(item.cost.value for item in items)
+                weight = sum(item.weight for item in items)
+                has_stealth_disadvantage = any(item.has_stealth_disadvantage for item in items)
+                if not self._is_within_budget(cost, weight) \
+                   or has_stealth_disadvantage and not self.allow_stealth_disadvantage:
+                    continue
+
+                character.equipped_armor_id = armor_id
+                character.equipped_shield_id = shield_id
+                if character.speed < character.base_speed and not self.allow_speed_penalty:
+                    continue
+
+                # The rules report the calculation, which is noise for hundreds of trial builds
+                with contextlib.redirect_stdout(io.StringIO()):
+                    character.update_armor_class()
+                options.append(DefenseOption(armor_id, shield_id, cost, weight, character.armor_class,
+                                             character.speed, has_stealth_disadvantage))
+        return prune_dominated(options)
+
+    def weapon_options(self) -> list[WeaponOption]:
+        """Returns the weapons (and the unarmed strike) within the budget, without the dominated ones."""
+        options = []
+        character = copy.deepcopy(self.character)
+        for weapon_id in ['', *GameController.weapons]:
+            weapon = GameController.weapons[weapon_id] if weapon_id else None
+            cost = weapon.cost.value if weapon is not None else 0
+            weight = weapon.weight if weapon is not None else 0
+            if not self._is_within_budget(cost, weight):
+                continue
+
+            character.equipped_weapon_id = weapon_id
+            damage_type = weapon.damage.type if weapon is not None else DamageType.BLUDGEONING
+            losses = []
+            for is_critical in (False, True):
+                distribution = {}
+                for damage, probability in damage_distribution(character, is_critical).items():
+                    loss = suffered_damage(self.target, damage, damage_type)
+                    distribution[loss] = distribution.get(loss, 0.0) + probability
+                losses.append(distribution)
+            expected_damage = sum(loss * probability
+                                  for loss, probability in attack_distribution(character, self.target).items())
+            options.append(WeaponOption(weapon_id, cost, weight, character.attack_modifier,
+                                        *losses, expected_damage))
+        return prune_dominated(options)
+
+    def optimize(self) -> list[Build]:
+        """Returns the Pareto front of the builds, sorted by the objectives."""
+        weapons = self.weapon_options()
+        builds = [Build(defense.armor_id, defense.shield_id, weapon.weapon_id,
+                        defense.cost + weapon.cost, defense.weight + weapon.weight,
+                        defense.armor_class, defense.speed, defense.has_stealth_disadvantage,
+                        weapon.expected_damage)
+                  for defense in self.defense_options() for weapon in weapons
+                  if self._is_within_budget(defense.cost + weapon.cost, defense.weight + weapon.weight)]
+
+        if 'win_probability' in self.objectives:
+            # The duels only depend on the weapon and the armor class of the character
+            tasks = sorted({(build.weapon_id, build.armor_class) for build in builds})
+            if self.max_workers == 1:
+                _initialize_worker(copy.deepcopy(self.character), self.opponent)
+                win_probabilities = dict(zip(tasks, map(_solve_win_probability, tasks)))
+            else:
+                with ProcessPoolExecutor(self.max_workers, initializer=_initialize_worker,
+                                         initargs=(self.character, self.opponent)) as executor:
+                    chunksize = max(1, len(tasks) // (4 * (self.max_workers or os.cpu_count() or 1)))
+                    win_probabilities = dict(zip(tasks, executor.map(_solve_win_probability, tasks,
+                                                                     chunksize=chunksize)))
+            for build in builds:
+                build.win_probability = win_probabilities[(build.weapon_id, build.armor_class)]
+
+        front = prune_dominated_builds(builds, self.objectives)
+        return sorted(front, key=lambda build: [-getattr(build, objective) for objective in self.objectives]
+                                               + [build.cost, build.weight])
+
+def prune_dominated_builds(builds: list[Build], objectives: tuple[str, ...]) -> list[Build]:
+    """Returns the builds not dominated by any other build."""
+    return [build for build in builds
+            if not any(other.dominates(build, objectives) for other in builds)]
+
+if __name__ == '__main__':
+    from simulation import create_duelists
+    barbarian, monk = create_duelists()
+    monk.update_armor_class()
+    barbarian.ability_scores[Ability.STRENGTH] = 16
+    optimizer = EquipmentOptimizer(barbarian, monk, objectives=('win_probability', 'armor_class'),
+                                   cost_budget=Currency(500, CurrencyType.GOLD))
+    for build in optimizer.optimize():
+        print(build)
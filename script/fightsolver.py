@@ -0,0 +1,155 @@
+"""Exact solver for the outcome of duels between two characters."""
+
+from __future__ import annotations
+import functools
+from character import Character
+from weapon import DamageType
+
+@functools.lru_cache(maxsize=None)
+def dice_distribution(num_rolls: int, num_sides: int) -> tuple[tuple[int, float], ...]:
+    """Returns the probability of every sum of rolling the specified dice."""
+    distribution = {0: 1.0}
+    for _ in range(num_rolls):
+        next_distribution = {}
+        for value, probability in distribution.items():
+            for face in range(1, num_sides + 1):
+                next_distribution[value + face] = next_distribution.get(value + face, 0.0) \
+                                                  + probability / num_sides
+        distribution = next_distribution
+    return tuple(sorted(distribution.items()))
+
+def damage_distribution(character: Character, is_critical = False) -> dict[int, float]:
+    """Returns the probability of every damage value of Character.roll_damage."""
+
+    ## Unarmed strikes deal a fix 1 + STR modifier damage (PH. 195)
+    weapon = character.equipped_weapon
+    if weapon is None:
+        return {1 + character.damage_modifier: 1.0}
+
+    ## Critical hits roll the damage of the weapon twice (PH. 196)
+    value = weapon.damage._value
+    num_damage_rolls = 2 if is_critical else 1
+    if isinstance(value, int):
+        return {num_damage_rolls * value + character.damage_modifier: 1.0}
+
+    return {damage + character.damage_modifier: probability
+            for damage, probability in dice_distribution(num_damage_rolls * value.num_rolls,
+                                                         value.num_sides)}
+
+def suffered_damage(target: Character, damage: int, damage_type: DamageType) -> int:
+    """Returns the hitpoints lost by the target for the damage, like Character.suffer_damage."""
+    if damage_type in target.immunities:
+        return 0
+    if damage_type in target.vulnerabilities:
+        return damage * 2
+    elif damage_type in target.resistances:
+        return damage // 2
+    return damage
+
+def hit_probabilities(attack_modifier: int, armor_class: int) -> tuple[float, float]:
+    """
+    Returns the probability of a normal hit and a critical hit for an attack
+    roll with the specified modifier against the armor class. A natural 20
+    is always a critical hit, otherwise the attack roll has to exceed the AC.
+    """
+    num_hits = sum(1 for base in range(1, 20) if base + attack_modifier > armor_class)
+    return num_hits / 20, 1 / 20
+
+def attack_distribution(source: Character, target: Character) -> dict[int, float]:
+    """Returns the probability of every hitpoint loss of the target from one attack of the source."""
+    weapon = source.equipped_weapon
+    damage_type = weapon.damage.type if weapon is not None else DamageType.BLUDGEONING
+    hit_chance, critical_chance = hit_probabilities(source.attack_modifier, target.armor_class)
+
+    distribution = {0: 1.0 - hit_chance - critical_chance}
+    for is_critical, chance in ((False, hit_chance), (True, critical_chance)):
+        for damage, probability in damage_distribution(source, is_critical).items():
+            loss = suffered_damage(target, damage, damage_type)
+            distribution[loss] = distribution.get(loss, 0.0) + chance * probability
+    return distribution
+
+class FightOutcome:
+    """The exact outcome of a duel between two characters."""
+
+    """The probability that the first character wins the fight."""
+    win_probability: float
+
+    """The expected number of attacks made during the fight."""
+    expected_turns: float
+
+    def __init__(self, win_probability: float, expected_turns: float):
+        self.win_probability = win_probability
+        self.expected_turns = expected_turns
+
+    def __repr__(self) -> str:
+        return f'FightOutcome(win_probability={self.win_probability:.6f}, ' \
+               f'expected_turns={self.expected_turns:.4f})'
+
+class FightSolver:
+
+    @classmethod
+    def solve(cls, c1: Character, c2: Character) -> FightOutcome:
+        """
+        Computes the exact outcome of simulation.simulate_fight between the
+        characters, c1 attacking first. Identical duels are answered from
+        the cache without solving them again.
+        """
+        first_attack = attack_distribution(c1, c2)
+        second_attack = attack_distribution(c2, c1)
+        return cls._solve(c1.hitpoints, c2.hitpoints,
+                          tuple(sorted(first_attack.items())),
+                          tuple(sorted(second_attack.items())))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _solve(first_hitpoints: int, second_hitpoints: int,
+               first_attack: tuple[tuple[int, float], ...],
+               second_attack: tuple[tuple[int, float], ...]) -> FightOutcome:
+        """
+        Solves the Markov chain over the (first HP, second HP, attacker) states.
+
+        Attacks dealing no damage keep the hitpoints, so for every HP pair the
+        two states (first or second attacking) only depend on each other and on
+        states with less hitpoints. These two linear equations are solved in
+        closed form, while the HP pairs are processed in increasing order.
+        """
+        assert all(loss >= 0 for loss, _ in first_attack + second_attack), \
+               'Attacks healing the target are not supported by the solver'
+
+        first_miss = sum(probability for loss, probability in first_attack if loss == 0)
+        second_miss = sum(probability for loss, probability in second_attack if loss == 0)
+        first_hits = [(loss, probability) for loss, probability in first_attack if loss > 0]
+        second_hits = [(loss, probability) for loss, probability in second_attack if loss > 0]
+        assert first_miss * second_miss < 1.0, 'Neither character can damage the other'
+        stall = 1.0 - first_miss * second_miss
+
+        # Tables indexed by [first HP][second HP], for the first or second character attacking
+        win_first_turn = [[0.0] * (second_hitpoints + 1) for _ in range(first_hitpoints + 1)]
+        win_second_turn = [[0.0] * (second_hitpoints + 1) for _ in range(first_hitpoints + 1)]
+        turns_first_turn = [[0.0] * (second_hitpoints + 1) for _ in range(first_hitpoints + 1)]
+        turns_second_turn = [[0.0] * (second_hitpoints + 1) for _ in range(first_hitpoints + 1)]
+
+        for a in range(1, first_hitpoints + 1):
+            for b in range(1, second_hitpoints + 1):
+                win_after_first = turns_after_first = 0.0
+                for loss, probability in first_hits:
+                    if loss >= b:
+                        win_after_first += probability
+                    else:
+                        win_after_first += probability * win_second_turn[a][b - loss]
+                        turns_after_first += probability * turns_second_turn[a][b - loss]
+
+                win_after_second = turns_after_second = 0.0
+                for loss, probability in second_hits:
+                    if loss < a:
+                        win_after_second += probability * win_first_turn[a - loss][b]
+                        turns_after_second += probability * turns_first_turn[a - loss][b]
+
+                win_first_turn[a][b] = (win_after_first + first_miss * win_after_second) / stall
+                win_second_turn[a][b] = win_after_second + second_miss * win_first_turn[a][b]
+                turns_first_turn[a][b] = (1 + turns_after_first
+                                          + first_miss * (1 + turns_after_second)) / stall
+                turns_second_turn[a][b] = 1 + turns_after_second + second_miss * turns_first_turn[a][b]
+
+        return FightOutcome(win_first_turn[first_hitpoints][second_hitpoints],
+                            turns_first_turn[first_hitpoints][second_hitpoints])
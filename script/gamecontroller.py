@@ -1,13 +1,22 @@
 from typing import ClassVar
 from armor import Armor, ArmorReader
 from weapon import Weapon, WeaponReader
+from contentregistry import ContentRegistry
 
 class GameController:
-    armors: ClassVar[dict[str, Armor]]
-    weapons: ClassVar[dict[str, Weapon]]
 
-    @classmethod
-    def load_weapons_and_armors(cls):
-        cls.armors = ArmorReader.read_armors_from_file('content/armors.yaml')
-        cls.weapons = WeaponReader.read_weapons_from_file('content/weapons.yaml')
+    """The armor catalog, materializing the armors on first access."""
+    armors: ClassVar[ContentRegistry] = ContentRegistry('content/armors.yaml', 'armors',
+                                                        ArmorReader.read_armor,
+                                                        ArmorReader.read_armors_from_file)
+
+    """The weapon catalog, materializing the weapons on first access."""
+    weapons: ClassVar[ContentRegistry] = ContentRegistry('content/weapons.yaml', 'weapons',
+                                                         WeaponReader.read_weapon,
+                                                         WeaponReader.read_weapons_from_file)
 
+    @classmethod
+    def load_weapons_and_armors(cls, use_cache = True):
+        """Eagerly loads the weapon and armor catalogs, from the compiled content cache if it is up to date."""
+        cls.armors.warm_up(use_cache)
+        cls.weapons.warm_up(use_cache)
@@ -0,0 +1,134 @@
+"""Resolution of one check for a whole group of characters at once."""
+
+from __future__ import annotations
+import numpy as np
+from character import Character, Ability, Skill
+from initiative import EncounterScheduler
+
+"""The abilities in the order of the modifier columns."""
+ABILITIES = list(Ability)
+
+class CheckResults:
+    """The results of a check of a group, one entry per character in the order of the group."""
+
+    """The kept d20 rolls."""
+    rolls: np.ndarray
+
+    """The rolls with the modifiers added."""
+    totals: np.ndarray
+
+    def __init__(self, rolls: np.ndarray, totals: np.ndarray):
+        self.rolls = rolls
+        self.totals = totals
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def successes(self, difficulty_class: int) -> np.ndarray:
+        """Whether the characters meet the difficulty class."""
+        return self.totals >= difficulty_class
+
+class CheckGroup:
+    """
+    A group of characters (a party, a crowd) resolving checks together.
+
+    The ability modifiers, proficiencies and the equipment-caused disadvantages
+    of the characters are collected into arrays once, then every check of the
+    group is resolved with vectorized d20 rolls, following the rules of
+    Character.roll_ability_check, roll_skill_check and do_saving_throw.
+    Advantage is encoded per character as 1, disadvantage as -1, having
+    both (or neither) as 0 (PH. 173).
+    """
+
+    def __init__(self, characters: list[Character], rng: np.random.Generator = None):
+        self.characters = list(characters)
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.ability_modifiers = np.array([[character.ability_modifiers[ability] for ability in ABILITIES]
+                                           for character in self.characters],
+                                          dtype=np.int64).reshape(-1, len(ABILITIES))
+        self.proficiency_bonuses = np.array([character.proficiency_bonus for character in self.characters],
+                                            dtype=np.int64)
+
+        # Wearing armor without proficiency causes disadvantage on STR and DEX checks and saves (PH. 144),
+        # armor causing stealth disadvantage on Dexterity (Stealth) checks
+        armors = [character.equipped_armor for character in self.characters]
+        self.has_unproficient_armor = np.array([armor is not None
+                                                and armor.type not in character.armor_type_proficiencies
+                                                for character, armor in zip(self.characters, armors)],
+                                               dtype=bool)
+        self.has_stealth_disadvantage = np.array([armor is not None and armor.has_stealth_disadvantage
+                                                  for armor in armors], dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.characters)
+
+    def _proficiencies(self, attribute: str, value) -> np.ndarray:
+        """Whether the characters list the value in the specified proficiency attribute."""
+        return np.array([value in getattr(character, attribute) for character in self.characters], dtype=bool)
+
+    def roll(self, modifiers: np.ndarray, advantage: np.ndarray) -> CheckResults:
+        """Rolls a d20 for every character, keeping the higher or lower of two rolls on (dis)advantage."""
+        rolls = self.rng.integers(1, 21, size=(2, len(self)))
+        kept = np.where(advantage > 0, rolls.max(axis=0), np.where(advantage < 0, rolls.min(axis=0), rolls[0]))
+        return CheckResults(kept, kept + modifiers)
+
+    def _advantage(self, ability: Ability, advantage: int | np.ndarray,
+                   *disadvantages: np.ndarray) -> np.ndarray:
+        """
+        Combines the specified advantage with the disadvantages of the characters,
+        including the one caused by armor without proficiency on STR and DEX rolls.
+        """
+        advantage = np.broadcast_to(np.sign(advantage), (len(self),))
+        has_disadvantage = advantage < 0
+        if ability in (Ability.STRENGTH, Ability.DEXTERITY):
+            has_disadvantage = has_disadvantage | self.has_unproficient_armor
+        for disadvantage in disadvantages:
+            has_disadvantage = has_disadvantage | disadvantage
+        return (advantage > 0).astype(np.int64) - has_disadvantage
+
+    ## Checks
+    ## ======
+
+    def ability_check(self, ability: Ability, advantage: int | np.ndarray = 0) -> CheckResults:
+        """Rolls an ability check for every character."""
+        return self.roll(self.ability_modifiers[:, ABILITIES.index(ability)],
+                         self._advantage(ability, advantage))
+
+    def skill_check(self, skill: Skill, advantage: int | np.ndarray = 0) -> CheckResults:
+        """Rolls a skill check for every character."""
+        ability = Character._SKILL_TO_ABILITY_SCORE[skill]
+        disadvantages = (self.has_stealth_disadvantage,) if skill == Skill.STEALTH else ()
+        modifiers = self.ability_modifiers[:, ABILITIES.index(ability)] \
+                    + self._proficiencies('skill_proficiencies', skill) * self.proficiency_bonuses
+        return self.roll(modifiers, self._advantage(ability, advantage, *disadvantages))
+
+    def saving_throw(self, ability: Ability, advantage: int | np.ndarray = 0) -> CheckResults:
+        """Rolls a saving throw for every character."""
+        modifiers = self.ability_modifiers[:, ABILITIES.index(ability)] \
+                    + self._proficiencies('saving_throw_proficiencies', ability) * self.proficiency_bonuses
+        return self.roll(modifiers, self._advantage(ability, advantage))
+
+    def initiative(self) -> CheckResults:
+        """Rolls initiative (a Dexterity check) for every character."""
+        return self.ability_check(Ability.DEXTERITY)
+
+    ## Group resolutions
+    ## =================
+
+    def group_check(self, skill: Skill, difficulty_class: int, advantage: int | np.ndarray = 0) -> bool:
+        """Resolves a group check: the group succeeds if at least half of the characters succeed (PH. 175)."""
+        successes = self.skill_check(skill, advantage).successes(difficulty_class)
+        return 2 * int(successes.sum()) >= len(self)
+
+    def mass_saving_throw(self, ability: Ability, difficulty_class: int,
+                          advantage: int | np.ndarray = 0) -> np.ndarray:
+        """Resolves a saving throw of every character against an effect, returns whether they succeeded."""
+        return self.saving_throw(ability, advantage).successes(difficulty_class)
+
+    def schedule_encounter(self) -> EncounterScheduler:
+        """Creates an encounter of the group with the initiative of every character rolled at once."""
+        scheduler = EncounterScheduler()
+        for character, initiative in zip(self.characters, self.initiative().totals.tolist()):
+            scheduler.add_combatant(character, initiative)
+        return scheduler
@@ -0,0 +1,137 @@
+"""Initiative based turn scheduling for encounters with many combatants."""
+
+from __future__ import annotations
+import heapq
+import itertools
+from character import Character, Condition, Ability
+
+class EncounterScheduler:
+    """
+    Turn order of the combatants of an encounter.
+
+    The combatants that did not act yet in the current round are kept in a
+    priority queue ordered by initiative, the ones that already acted wait in
+    the queue of the next round. Removed and delayed combatants leave a stale
+    entry behind, which is discarded when it reaches the top of the queue, so
+    every operation takes O(log n) time.
+    """
+
+    """Combatants with any of these conditions are skipped when their turn comes."""
+    DEFAULT_SKIPPED_CONDITIONS = frozenset({Condition.UNCONSCIOUS, Condition.STABLE})
+
+    def __init__(self, combatants: list[Character] = (),
+                 skipped_conditions: frozenset[Condition] = DEFAULT_SKIPPED_CONDITIONS):
+        """Creates the scheduler and rolls initiative for the specified combatants."""
+        self.round = 1
+        self.skipped_conditions = skipped_conditions
+        self._current_round = []
+        self._next_round = []
+        self._entries = {}
+        self._initiatives = {}
+        self._num_stale_entries = 0
+        self._counter = itertools.count()
+        self._last_initiative = None
+
+        for combatant in combatants:
+            self.add_combatant(combatant)
+
+    def __len__(self) -> int:
+        """The number of combatants in the encounter."""
+        return len(self._entries)
+
+    def __contains__(self, combatant: Character) -> bool:
+        return id(combatant) in self._entries
+
+    def initiative_of(self, combatant: Character) -> int:
+        """Returns the initiative of the specified combatant."""
+        return self._initiatives[id(combatant)]
+
+    ## Managing combatants
+    ## ===================
+
+    def add_combatant(self, combatant: Character, initiative: int = None) -> None:
+        """
+        Adds a combatant to the encounter, rolling its initiative if not specified.
+
+        A combatant joining mid-round acts in the current round if its initiative
+        comes after the combatant that acted last, otherwise in the next round.
+        """
+        assert id(combatant) not in self._entries, f'{combatant.name} is already in the encounter'
+        if initiative is None:
+            initiative = combatant.roll_initiative()
+        self._initiatives[id(combatant)] = initiative
+
+        acts_this_round = self._last_initiative is None or initiative <= self._last_initiative
+        self._push(combatant, self._current_round if acts_this_round else self._next_round)
+
+    def remove_combatant(self, combatant: Character) -> None:
+        """Removes a combatant from the encounter, for example when it dies."""
+        self._invalidate(combatant)
+        del self._initiatives[id(combatant)]
+
+    def delay_turn(self, combatant: Character, initiative: int) -> None:
+        """
+        Delays the turn of a combatant who did not act yet in this round to a lower
+        initiative. The combatant keeps the new initiative for the following rounds.
+        """
+        assert initiative <= self._initiatives[id(combatant)], 'Turns can only be delayed'
+        assert self._entries[id(combatant)][-2] is self._current_round, \
+               f'{combatant.name} already acted in this round'
+        self._invalidate(combatant)
+        self._initiatives[id(combatant)] = initiative
+        self._push(combatant, self._current_round)
+
+    ## Turn order
+    ## ==========
+
+    def next_turn(self) -> Character | None:
+        """
+        Returns the combatant whose turn comes next, starting a new round when every
+        combatant acted. Returns None if there are no combatants able to act.
+        """
+        num_skipped = 0
+        while self._entries and num_skipped <= len(self._entries):
+            if not self._current_round:
+                self._current_round, self._next_round = self._next_round, self._current_round
+                self._last_initiative = None
+                self.round += 1
+
+            entry = heapq.heappop(self._current_round)
+            combatant = entry[3]
+            if entry[-1] is None:
+                self._num_stale_entries -= 1
+                continue
+
+            self._last_initiative = self._initiatives[id(combatant)]
+            self._push(combatant, self._next_round)
+            if self.skipped_conditions.isdisjoint(combatant.active_conditions):
+                return combatant
+            num_skipped += 1
+
+        return None
+
+    def turn_order(self) -> list[Character]:
+        """Returns the combatants who did not act yet in this round, in turn order."""
+        return [entry[3] for entry in sorted(self._current_round) if entry[-1] is not None]
+
+    def _push(self, combatant: Character, queue: list) -> None:
+        """Queues the combatant, ties in initiative are broken by the dexterity score (PH. 189)."""
+        entry = [-self._initiatives[id(combatant)], -combatant.ability_scores[Ability.DEXTERITY],
+                 next(self._counter), combatant, queue, True]
+        self._entries[id(combatant)] = entry
+        heapq.heappush(queue, entry)
+
+    def _invalidate(self, combatant: Character) -> None:
+        """Marks the queued entry of the combatant stale, compacting the queues if needed."""
+        entry = self._entries.pop(id(combatant))
+        entry[-1] = None
+        self._num_stale_entries += 1
+
+        if self._num_stale_entries > len(self._entries):
+            self._current_round = [e for e in self._current_round if e[-1] is not None]
+            self._next_round = [e for e in self._next_round if e[-1] is not None]
+            for queue in (self._current_round, self._next_round):
+                heapq.heapify(queue)
+                for e in queue:
+                    e[-2] = queue
+            self._num_stale_entries = 0
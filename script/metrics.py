@@ -0,0 +1,257 @@
+"""
+Lightweight metrics (counters, gauges and histograms) of the game, exported
+in the Prometheus text format to a file or a local HTTP endpoint.
+"""
+
+from __future__ import annotations
+from typing import Callable, Iterator
+import bisect
+import math
+import os
+import threading
+
+class _ThreadCells:
+    """
+    Per-thread accumulators of a metric. Every thread updates its own cell
+    without locking, the cells are only summed when the metric is exported.
+    """
+
+    __slots__ = ('_local', '_cells', '_size')
+
+    def __init__(self, size: int):
+        self._local = threading.local()
+        self._cells = []
+        self._size = size
+
+    def _new_cell(self) -> list:
+        """Creates the cell of the current thread."""
+        cell = self._local.cell = [0] * self._size
+        self._cells.append(cell)
+        return cell
+
+    def totals(self) -> list:
+        totals = [0] * self._size
+        for cell in list(self._cells):
+            for index, value in enumerate(cell):
+                totals[index] += value
+        return totals
+
+class _CounterChild(_ThreadCells):
+    """The counter of one combination of label values."""
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount = 1) -> None:
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._new_cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self.totals()[0]
+
+class _GaugeChild:
+    """The gauge of one combination of label values, set directly or computed by a function on export."""
+
+    __slots__ = ('_value', '_function')
+
+    def __init__(self):
+        self._value = 0
+        self._function = None
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        return self._function() if self._function is not None else self._value
+
+class _HistogramChild(_ThreadCells):
+    """
+    The histogram of one combination of label values: the count of every
+    bucket (and of the +Inf bucket), the sum and the count.
+    """
+
+    __slots__ = ('_buckets',)
+
+    def __init__(self, buckets: tuple[float, ...]):
+        super().__init__(len(buckets) + 3)
+        self._buckets = buckets
+
+    def observe(self, value: float) -> None:
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[bisect.bisect_left(self._buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+class Metric:
+    """Base class of the metrics, with optional labels."""
+
+    """The type of the metric in the exported text."""
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _create_child(self):
+        raise NotImplementedError()
+
+    def labels(self, *values):
+        """Returns the metric of the specified label values (kept for fast repeated updates)."""
+        child = self._children.get(values)
+        if child is None:
+            assert len(values) == len(self.labelnames), f'{self.name} has labels {self.labelnames}'
+            with self._lock:
+                child = self._children.setdefault(values, self._create_child())
+        return child
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """The exported samples: the name suffix, the labels and the value."""
+        for values, child in list(self._children.items()):
+            yield '', dict(zip(self.labelnames, map(str, values))), child.value
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    TYPE = 'counter'
+
+    def _create_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount = 1) -> None:
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    """Value going up and down."""
+
+    TYPE = 'gauge'
+
+    def _create_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets (upper bounds, inclusive)."""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...],
+                 labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _create_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, map(str, values)))
+            totals = child.totals()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), totals):
+                cumulative += count
+                yield '_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield '_sum', labels, totals[-2]
+            yield '_count', labels, totals[-1]
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+class MetricsRegistry:
+    """The registered metrics, by name."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class: type[Metric], name: str, *args) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args)
+            elif not isinstance(metric, metric_class):
+                raise AssertionError(f'Metric {name} is already registered as a {metric.TYPE}')
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, buckets: tuple[float, ...],
+                  labelnames: tuple[str, ...] = ()) -> Histogram:
+        return self._register(Histogram, name, documentation, buckets, labelnames)
+
+    def get(self, name: str) -> Metric | None:
+        return self._metrics.get(name)
+
+    def export(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.TYPE}')
+            for suffix, labels, value in metric._samples():
+                label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+                lines.append(f'{metric.name}{suffix}{{{label_text}}} {_format_value(value)}' if label_text
+                             else f'{metric.name}{suffix} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, filename: str) -> None:
+        """Atomically writes the exported metrics into the file (e.g. for a node exporter text collector)."""
+        temporary_filename = f'{filename}.{os.getpid()}.tmp'
+        with open(temporary_filename, 'w') as file:
+            file.write(self.export())
+        os.replace(temporary_filename, filename)
+
+    def serve(self, port = 9464, host = '127.0.0.1'):
+        """Serves the exported metrics over HTTP in a daemon thread, returns the server (shut down to stop)."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.export().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        return server
+
+"""The registry of the metrics instrumented in the game."""
+REGISTRY = MetricsRegistry()
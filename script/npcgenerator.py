@@ -0,0 +1,117 @@
+"""Bulk generation of non-player characters of a given race."""
+
+from __future__ import annotations
+import numpy as np
+from character import Character, Ability
+from race import Race, RaceRegistry
+
+"""The abilities in the order of the ability score columns."""
+ABILITIES = list(Ability)
+
+class NpcPool:
+    """
+    Columnar storage of generated characters: one array entry per character.
+    Names are stored as indices into the shared name tables.
+    """
+
+    """The rolled ability scores before racial modifiers (character x ability)."""
+    base_ability_scores: np.ndarray
+
+    """The racial ability score modifiers, added to every character."""
+    ability_score_modifiers: np.ndarray
+
+    """Whether the characters use female names."""
+    is_female: np.ndarray
+
+    """Indices of the first names and the family names in the name tables."""
+    first_name_index: np.ndarray
+    family_name_index: np.ndarray
+
+    def __init__(self, race: Race, subrace_id: str | None, base_ability_scores: np.ndarray,
+                 ability_score_modifiers: np.ndarray, is_female: np.ndarray,
+                 first_name_index: np.ndarray, family_name_index: np.ndarray,
+                 first_names: list[str], family_names: list[str]):
+        self.race = race
+        self.subrace_id = subrace_id
+        self.base_ability_scores = base_ability_scores
+        self.ability_score_modifiers = ability_score_modifiers
+        self.is_female = is_female
+        self.first_name_index = first_name_index
+        self.family_name_index = family_name_index
+        self.first_names = first_names
+        self.family_names = family_names
+
+    def __len__(self) -> int:
+        return len(self.base_ability_scores)
+
+    @property
+    def ability_scores(self) -> np.ndarray:
+        """The ability scores including the racial modifiers (character x ability)."""
+        return self.base_ability_scores + self.ability_score_modifiers
+
+    def name(self, index: int) -> str:
+        """Returns the full name of the character with the specified index."""
+        first_name = self.first_names[self.first_name_index[index]]
+        if not self.family_names:
+            return first_name
+        return f'{first_name} {self.family_names[self.family_name_index[index]]}'
+
+    def to_characters(self, start = 0, stop: int = None) -> list[Character]:
+        """Materializes the characters of the pool within the index range as Character objects."""
+        delta = self.race.deltas[self.subrace_id]
+        characters = []
+        for index, scores in enumerate(self.base_ability_scores[start:stop].tolist(), start):
+            character = Character()
+            character.name = self.name(index)
+            character.ability_scores = dict(zip(ABILITIES, scores))
+            delta.apply(character)
+            characters.append(character)
+        return characters
+
+class NpcGenerator:
+    """Generator of characters of a race and optionally a subrace."""
+
+    def __init__(self, race_id: str, subrace_id: str = None, rng: np.random.Generator = None):
+        self.race = RaceRegistry.get(race_id)
+        self.subrace_id = subrace_id
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        delta = self.race.deltas[subrace_id]
+        self.ability_score_modifiers = np.array([delta.ability_score_modifiers.get(ability, 0)
+                                                 for ability in ABILITIES], dtype=np.int16)
+
+        # Races without own names (e.g. humans) use the names of all their subraces
+        male_names, female_names, family_names = self.race.names(subrace_id)
+        if subrace_id is None:
+            subraces = self.race.subraces.values()
+            male_names = male_names or [name for subrace in subraces for name in subrace.male_names or []]
+            female_names = female_names or [name for subrace in subraces for name in subrace.female_names or []]
+            family_names = family_names or [name for subrace in subraces for name in subrace.family_names or []]
+        male_names, female_names = male_names or female_names, female_names or male_names
+        assert male_names, f'No names are defined for race "{race_id}"'
+
+        self.first_names = list(male_names) + list(female_names)
+        self.num_male_names = len(male_names)
+        self.family_names = list(family_names or [])
+
+    def roll_ability_scores(self, num_characters: int) -> np.ndarray:
+        """Rolls 4d6 and drops the lowest die for every ability score of every character (PH. 13)."""
+        rolls = self.rng.integers(1, 7, size=(num_characters, len(ABILITIES), 4), dtype=np.int16)
+        return rolls.sum(axis=2, dtype=np.int16) - rolls.min(axis=2)
+
+    def generate_pool(self, num_characters: int) -> NpcPool:
+        """Generates the characters into a columnar pool."""
+        is_female = self.rng.random(num_characters) < 0.5
+        num_female_names = len(self.first_names) - self.num_male_names
+        first_name_index = np.where(is_female,
+                                    self.num_male_names + self.rng.integers(0, num_female_names, num_characters),
+                                    self.rng.integers(0, self.num_male_names, num_characters))
+        family_name_index = self.rng.integers(0, max(1, len(self.family_names)), num_characters)
+
+        return NpcPool(self.race, self.subrace_id, self.roll_ability_scores(num_characters),
+                       self.ability_score_modifiers, is_female, first_name_index, family_name_index,
+                       self.first_names, self.family_names)
+
+    def generate_characters(self, num_characters: int) -> list[Character]:
+        """Generates the characters as Character objects."""
+        return self.generate_pool(num_characters).to_characters()
@@ -0,0 +1,39 @@
+"""Parties of characters adventuring together."""
+
+from __future__ import annotations
+from character import Character
+from ruleengine import RuleEngine
+
+class Party:
+    """The members of an adventuring party."""
+
+    def __init__(self, members: list[Character] = ()):
+        self.members = list(members)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def award_experience(self, amount: int) -> dict[Character, tuple[int, int]]:
+        """
+        Splits the experience evenly among the members (rounding down, DMG. 260)
+        and returns the (previous level, reached level) of the members that
+        levelled-up.
+
+        Every member gains its share like by Character.add_experience, with the
+        'on:experience_gained' and 'on:level_gained' rule actions of all the
+        members executed in a single batched rule engine run.
+        """
+        if not self.members:
+            return {}
+        share = amount // len(self.members)
+
+        level_ups = {}
+        contexts = []
+        for member in self.members:
+            context = member.add_experience(share, execute_rules=False)
+            if context.has_attribute('reached_level'):
+                level_ups[member] = (context.get('previous_level'), context.get('reached_level'))
+            contexts.append(context)
+
+        RuleEngine.execute_rules_batch(contexts)
+        return level_ups
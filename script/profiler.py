@@ -0,0 +1,208 @@
+"""Profiling entry point running simulation workloads under cProfile or a sampling profiler."""
+
+from __future__ import annotations
+from collections import Counter
+from typing import Callable
+import argparse
+import cProfile
+import os
+import pstats
+import re
+import signal
+import sys
+import threading
+import time
+from character import Character, Ability
+from combatlog import EventLog, JsonlFileSink
+from gamecontroller import GameController
+from simulation import create_duelists, simulate_fight
+import rules.armorclass  # Registers the armor class rules used by the equipment events
+import rules.damage  # Registers the damage rules
+
+## Workloads
+## =========
+
+def fight_workload(num_iterations: int) -> None:
+    """Simulates fights between the example duelists."""
+    c1, c2 = create_duelists()
+    for _ in range(num_iterations):
+        c1.hitpoints, c2.hitpoints = c1.max_hitpoints, c2.max_hitpoints
+        simulate_fight(c1, c2)
+
+def rules_workload(num_iterations: int) -> None:
+    """Triggers the equipment and experience rule engine events of a character."""
+    character = Character()
+    character.ability_scores[Ability.DEXTERITY] = 14
+    for _ in range(num_iterations):
+        character.equip_armor('chain_shirt')
+        character.equip_shield('shield')
+        character.unequip_shield()
+        character.unequip_armor()
+        character.add_experience(100)
+
+"""Available workloads, called with the number of iterations."""
+WORKLOADS: dict[str, Callable[[int], None]] = {
+    'fight': fight_workload,
+    'rules': rules_workload,
+}
+
+## Subsystem attribution
+## =====================
+
+"""Subsystems and the functions attributed to them, by file path and function name."""
+SUBSYSTEMS = [
+    ('dice', lambda path, function: os.path.basename(path) in ('dice.py', 'random.py')),
+    ('rule matching', lambda path, function: os.path.basename(path) == 'ruleengine.py'
+                                             or function == 'when'),
+    ('rule actions', lambda path, function: function == 'then'),
+    ('content lookups', lambda path, function: os.path.basename(path) in ('gamecontroller.py', 'armor.py',
+                                                                          'weapon.py', 'currency.py')
+                                               or function.startswith('equipped_')
+                                               or f'{os.sep}yaml{os.sep}' in path),
+    ('I/O', lambda path, function: os.path.basename(path) in ('combatlog.py', 'gzip.py')
+                                   or f'{os.sep}logging{os.sep}' in path
+                                   or f'{os.sep}json{os.sep}' in path
+                                   or function in ('print', 'write', 'flush')),
+]
+
+def classify(path: str, function: str) -> str | None:
+    """Returns the subsystem of the specified function, or None if it belongs to none."""
+
+    # Built-in functions are reported as "<built-in method builtins.print>" or "<method 'write' of ...>"
+    if function.startswith('<'):
+        quoted = re.search(r"'(\w+)'", function)
+        function = quoted.group(1) if quoted else function.strip('<>').split('.')[-1]
+
+    for subsystem, matches in SUBSYSTEMS:
+        if matches(path, function):
+            return subsystem
+    return None
+
+def subsystem_times(stats: pstats.Stats) -> Counter:
+    """Sums the own time of the profiled functions per subsystem."""
+    times = Counter()
+    for (filename, _, function), (_, _, own_time, _, _) in stats.stats.items():
+        times[classify(filename, function) or 'other'] += own_time
+    return times
+
+## Sampling profiler
+## =================
+
+class SamplingProfiler:
+    """
+    Profiler periodically sampling the call stack of the profiled thread.
+
+    Where available, the samples are taken by a CPU time interval timer signal,
+    which interrupts the profiled (main) thread at any bytecode. Otherwise a
+    background thread samples the stack, which only gets to run when the
+    profiled thread releases the GIL and is therefore biased towards I/O.
+    """
+
+    def __init__(self, interval = 0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        if hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGPROF, lambda signum, frame: self._record(frame))
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._stopped.clear()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        if self._sampler is None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        else:
+            self._stopped.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._record(sys._current_frames().get(self._thread_id))
+
+    def _record(self, frame) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += 1
+
+    def write_collapsed(self, filename: str) -> None:
+        """Writes the samples in the collapsed stack format read by flamegraph tools."""
+        with open(filename, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+    def subsystem_times(self) -> Counter:
+        """Attributes every sample to the innermost frame belonging to a subsystem."""
+        times = Counter()
+        for stack, count in self.stacks.items():
+            subsystem = 'other'
+            for frame in reversed(stack.split(';')):
+                function, location = frame.rsplit(' (', 1)
+                subsystem = classify(location.rsplit(':', 1)[0], function) or subsystem
+                if subsystem != 'other':
+                    break
+            times[subsystem] += count * self.interval
+        return times
+
+## Entry point
+## ===========
+
+def print_subsystem_times(title: str, times: Counter) -> None:
+    total = sum(times.values()) or 1.0
+    print(title)
+    for subsystem, seconds in times.most_common():
+        print(f'  {subsystem:<16} {seconds:>9.3f} s {100 * seconds / total:>6.1f} %')
+
+def profile(workload: str, num_iterations: int, output_prefix: str,
+            profilers = ('cprofile', 'sampling'), interval = 0.001) -> None:
+    """Runs the workload under the specified profilers and writes their outputs."""
+    if 'cprofile' in profilers:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.runcall(WORKLOADS[workload], num_iterations)
+        print(f'cProfile: {workload} x{num_iterations} in {time.perf_counter() - start:.3f} s')
+        profiler.dump_stats(f'{output_prefix}.pstats')
+        print_subsystem_times(f'Written {output_prefix}.pstats, own time per subsystem:',
+                              subsystem_times(pstats.Stats(profiler)))
+
+    if 'sampling' in profilers:
+        profiler = SamplingProfiler(interval)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            WORKLOADS[workload](num_iterations)
+        finally:
+            profiler.stop()
+        print(f'Sampling: {workload} x{num_iterations} in {time.perf_counter() - start:.3f} s')
+        profiler.write_collapsed(f'{output_prefix}.collapsed')
+        print_subsystem_times(f'Written {output_prefix}.collapsed, sampled time per subsystem:',
+                              profiler.subsystem_times())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profiles a simulation workload.')
+    parser.add_argument('workload', choices=WORKLOADS.keys(), help='the workload to profile')
+    parser.add_argument('-n', '--iterations', type=int, default=1000, help='number of workload iterations')
+    parser.add_argument('-o', '--output', default='profile', help='prefix of the output files')
+    parser.add_argument('--profiler', choices=('cprofile', 'sampling', 'both'), default='both')
+    parser.add_argument('--interval', type=float, default=0.001, help='sampling interval in seconds')
+    parser.add_argument('--events', help='write the combat events as JSON lines into this file')
+    args = parser.parse_args()
+
+    GameController.load_weapons_and_armors()
+    if args.events:
+        EventLog.set_sink(JsonlFileSink(args.events))
+
+    profile(args.workload, args.iterations, args.output,
+            ('cprofile', 'sampling') if args.profiler == 'both' else (args.profiler,), args.interval)
+    EventLog.sink.close()
@@ -0,0 +1,305 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar
+import glob
+import os
+from armor import ArmorType
+from character import Character, Ability
+from contentcache import load_yaml
+from gamecontroller import GameController
+from weapon import Weapon, WeaponType
+
+class RaceDelta:
+    """
+    The combined effect of the traits of a race (and optionally a subrace),
+    compiled once so that it can be applied to characters in one step.
+    """
+
+    def __init__(self, race_id: str, subrace_id: str | None, speed: int):
+        self.race_id = race_id
+        self.subrace_id = subrace_id
+        self.speed = speed
+        self.ability_score_modifiers: dict[Ability, int] = {}
+        self.saving_throw_proficiencies: list[Ability] = []
+        self.armor_type_proficiencies: list[ArmorType] = []
+        self.weapon_type_proficiencies: list[WeaponType] = []
+        self.weapon_proficiencies: list[str] = []
+
+    def apply(self, character: Character) -> None:
+        """
+        Applies the race to a character without a race yet. The ability score
+        modifiers are added to the scores, so a delta is applied only once.
+        """
+        assert character.race_id is None, f'Character "{character.name}" already has the race {character.race_id}'
+        character.race_id = self.race_id
+        character.subrace_id = self.subrace_id
+        character.base_speed = self.speed
+        for ability, modifier in self.ability_score_modifiers.items():
+            character.ability_scores[ability] += modifier
+        for proficiencies, granted in ((character.saving_throw_proficiencies, self.saving_throw_proficiencies),
+                                       (character.armor_type_proficiencies, self.armor_type_proficiencies),
+                                       (character.weapon_type_proficiencies, self.weapon_type_proficiencies),
+                                       (character.weapon_proficiencies, self.weapon_proficiencies)):
+            proficiencies.extend(value for value in granted if value not in proficiencies)
+
+class Subrace:
+
+    """The ID of the subrace, derived from its name."""
+    id: str
+
+    """The in-game name of the subrace."""
+    name: str
+
+    """The movement speed overriding the speed of the race, if any."""
+    speed: int | None
+
+    """The name lists overriding the ones of the race, if any."""
+    male_names: list[str] | None
+    female_names: list[str] | None
+    family_names: list[str] | None
+
+    """The trait descriptors of the subrace."""
+    traits: list[dict]
+
+    def __init__(self, id: str, name: str, speed: int | None, male_names: list[str] | None,
+                 female_names: list[str] | None, family_names: list[str] | None, traits: list[dict]):
+        self.id = id
+        self.name = name
+        self.speed = speed
+        self.male_names = male_names
+        self.female_names = female_names
+        self.family_names = family_names
+        self.traits = traits
+
+class Race:
+
+    """The ID of the race, the name of its content file."""
+    id: str
+
+    """The in-game name of the race."""
+    name: str
+
+    """The size category of the race."""
+    size: str
+
+    """The movement speed of the race (feet/turn)."""
+    speed: int
+
+    """The languages spoken by the race."""
+    languages: list[str]
+
+    """The names used by the race."""
+    male_names: list[str]
+    female_names: list[str]
+    family_names: list[str]
+
+    """The trait descriptors of the race."""
+    traits: list[dict]
+
+    """The subraces of the race by their ID."""
+    subraces: dict[str, Subrace]
+
+    """The compiled deltas of the race alone (None key) and of every subrace."""
+    deltas: dict[str | None, RaceDelta]
+
+    def __init__(self, id: str, name: str, size: str, speed: int, languages: list[str],
+                 male_names: list[str], female_names: list[str], family_names: list[str],
+                 traits: list[dict], subraces: dict[str, Subrace]):
+        self.id = id
+        self.name = name
+        self.size = size
+        self.speed = speed
+        self.languages = languages
+        self.male_names = male_names
+        self.female_names = female_names
+        self.family_names = family_names
+        self.traits = traits
+        self.subraces = subraces
+        self.deltas = {}
+
+    def names(self, subrace_id: str = None) -> tuple[list[str], list[str], list[str]]:
+        """Returns the male, female and family names, preferring the ones of the subrace."""
+        subrace = self.subraces[subrace_id] if subrace_id is not None else None
+        return tuple(getattr(subrace, attribute, None) or getattr(self, attribute)
+                     for attribute in ('male_names', 'female_names', 'family_names'))
+
+    def compile(self, weapon_ids_by_name: dict[str, str]) -> None:
+        """Compiles the deltas of the race and of every subrace."""
+        for subrace_id in [None, *self.subraces]:
+            subrace = self.subraces.get(subrace_id)
+            speed = subrace.speed if subrace is not None and subrace.speed is not None else self.speed
+            delta = RaceDelta(self.id, subrace_id, speed)
+            for trait in self.traits + (subrace.traits if subrace is not None else []):
+                RaceReader.compile_trait(trait, delta, weapon_ids_by_name)
+            self.deltas[subrace_id] = delta
+
+    def apply(self, character: Character, subrace_id: str = None) -> None:
+        """Applies the race and optionally one of its subraces to the character."""
+        self.deltas[subrace_id].apply(character)
+
+class RaceReader:
+
+    """Allowed values of the race descriptors, see races.md."""
+    SIZES = ('tiny', 'small', 'medium', 'large', 'huge', 'gargantuan')
+    ABILITIES = {ability.name.lower(): ability for ability in Ability}
+    ARMOR_TYPES = {'light': ArmorType.LIGHT, 'medium': ArmorType.MEDIUM,
+                   'heavy': ArmorType.HEAVY, 'shields': ArmorType.SHIELD}
+    WEAPON_CLASSES = {weapon_type.name.lower(): weapon_type for weapon_type in WeaponType}
+
+    """Trait types with the name of their mandatory data field and its allowed values."""
+    TRAIT_TYPES = {
+        'ability_score_modifier': ('modifiers', ABILITIES),
+        'armor_type_proficiency': ('armor_types', ARMOR_TYPES),
+        'weapon_class_proficiency': ('weapon_classes', WEAPON_CLASSES),
+        'weapon_proficiency': ('weapons', None),
+        'saving_throw_proficiency': ('abilities', ABILITIES),
+    }
+
+    @staticmethod
+    def _split_names(names: str | None) -> list[str] | None:
+        """Splits a comma separated list of names."""
+        if names is None:
+            return None
+        return [name.strip() for name in names.split(',') if name.strip()]
+
+    @staticmethod
+    def _subrace_id(name: str) -> str:
+        return name.strip().lower().replace(' ', '_').replace('-', '_')
+
+    @classmethod
+    def validate_traits(cls, traits: list, location: str, weapon_ids_by_name: dict[str, str]) -> list[str]:
+        """Validates the trait descriptors against the schema in races.md, returns the errors."""
+        errors = []
+        if not isinstance(traits, list):
+            return [f'{location}: traits must be a list']
+
+        for trait in traits:
+            where = f'{location}, trait "{trait.get("name") if isinstance(trait, dict) else trait}"'
+            if not isinstance(trait, dict) or 'name' not in trait or 'type' not in trait:
+                errors.append(f'{where}: traits must have a name and a type')
+                continue
+            if trait['type'] not in cls.TRAIT_TYPES:
+                errors.append(f'{where}: unknown trait type "{trait["type"]}"')
+                continue
+
+            field, allowed_values = cls.TRAIT_TYPES[trait['type']]
+            data = trait.get('data')
+            values = data.get(field) if isinstance(data, dict) else None
+            if trait['type'] == 'ability_score_modifier':
+                if not isinstance(values, dict):
+                    errors.append(f'{where}: data.{field} must be a dictionary')
+                    continue
+                errors += [f'{where}: invalid modifier {key}: {value}' for key, value in values.items()
+                           if key not in allowed_values or not isinstance(value, int)]
+            else:
+                if not isinstance(values, list):
+                    errors.append(f'{where}: data.{field} must be a list')
+                    continue
+                allowed_values = allowed_values if allowed_values is not None else weapon_ids_by_name
+                errors += [f'{where}: invalid value "{value}" in data.{field}' for value in values
+                           if value not in allowed_values]
+        return errors
+
+    @classmethod
+    def compile_trait(cls, trait: dict, delta: RaceDelta, weapon_ids_by_name: dict[str, str]) -> None:
+        """Adds the effect of a validated trait to the delta."""
+        field, allowed_values = cls.TRAIT_TYPES[trait['type']]
+        values = trait['data'][field]
+        match trait['type']:
+            case 'ability_score_modifier':
+                for ability, modifier in values.items():
+                    ability = allowed_values[ability]
+                    delta.ability_score_modifiers[ability] = delta.ability_score_modifiers.get(ability, 0) \
+                                                             + modifier
+            case 'armor_type_proficiency':
+                delta.armor_type_proficiencies += [allowed_values[value] for value in values]
+            case 'weapon_class_proficiency':
+                delta.weapon_type_proficiencies += [allowed_values[value] for value in values]
+            case 'weapon_proficiency':
+                delta.weapon_proficiencies += [weapon_ids_by_name[value] for value in values]
+            case 'saving_throw_proficiency':
+                delta.saving_throw_proficiencies += [allowed_values[value] for value in values]
+
+    @classmethod
+    def read_race_from_file(cls, filename: str, weapons: Mapping[str, Weapon]) -> Race:
+        """Reads, validates and compiles the race from the specified file."""
+        with open(filename, 'r', encoding='utf-8') as file:
+            race_desc = load_yaml(file)
+
+        weapon_ids_by_name = {weapon.name: weapon_id for weapon_id, weapon in weapons.items()}
+        errors = []
+        for field in ('name', 'size', 'speed'):
+            if field not in race_desc:
+                errors.append(f'{filename}: missing mandatory field "{field}"')
+        if race_desc.get('size', 'medium') not in cls.SIZES:
+            errors.append(f'{filename}: invalid size "{race_desc["size"]}"')
+        errors += cls.validate_traits(race_desc.get('traits', []), filename, weapon_ids_by_name)
+
+        subraces = {}
+        for subrace_desc in race_desc.get('subraces', []):
+            if 'name' not in subrace_desc:
+                errors.append(f'{filename}: subraces must have a name')
+                continue
+            location = f'{filename}, subrace "{subrace_desc["name"]}"'
+            errors += cls.validate_traits(subrace_desc.get('traits', []), location, weapon_ids_by_name)
+            subrace = Subrace(cls._subrace_id(subrace_desc['name']), subrace_desc['name'],
+                              subrace_desc.get('speed'),
+                              cls._split_names(subrace_desc.get('male_names')),
+                              cls._split_names(subrace_desc.get('female_names')),
+                              cls._split_names(subrace_desc.get('family_names')),
+                              subrace_desc.get('traits', []))
+            subraces[subrace.id] = subrace
+
+        if errors:
+            raise AssertionError('Invalid race definition:\n  ' + '\n  '.join(errors))
+
+        race = Race(os.path.splitext(os.path.basename(filename))[0], race_desc['name'],
+                    race_desc['size'], race_desc['speed'], race_desc.get('languages', []),
+                    cls._split_names(race_desc.get('male_names')) or [],
+                    cls._split_names(race_desc.get('female_names')) or [],
+                    cls._split_names(race_desc.get('family_names')) or [],
+                    race_desc.get('traits', []), subraces)
+        race.compile(weapon_ids_by_name)
+        return race
+
+    @classmethod
+    def read_races_from_directory(cls, directory: str, weapons: Mapping[str, Weapon]) -> dict[str, Race]:
+        """Reads every race file of the directory in parallel."""
+
+        # Materializing the weapons up-front, the workers only read the catalog
+        weapons = dict(weapons.items())
+        filenames = sorted(glob.glob(os.path.join(directory, '*.yaml')))
+        with ThreadPoolExecutor() as executor:
+            races = executor.map(lambda filename: cls.read_race_from_file(filename, weapons), filenames)
+            return {race.id: race for race in races}
+
+class RaceRegistry:
+    """Registry of the races, loaded from the content directory on first use."""
+
+    """The directory of the race files."""
+    directory: ClassVar[str] = 'content/races'
+
+    _races: ClassVar[dict[str, Race] | None] = None
+
+    @classmethod
+    def races(cls) -> dict[str, Race]:
+        """Returns every race by its ID."""
+        if cls._races is None:
+            cls._races = RaceReader.read_races_from_directory(cls.directory, GameController.weapons)
+        return cls._races
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Drops the loaded races, which are read again on next use."""
+        cls._races = None
+
+    @classmethod
+    def get(cls, race_id: str) -> Race:
+        """Returns the race with the specified ID."""
+        return cls.races()[race_id]
+
+    @classmethod
+    def apply(cls, character: Character, race_id: str, subrace_id: str = None) -> None:
+        """Applies the precompiled race and subrace to the character."""
+        cls.get(race_id).apply(character, subrace_id)
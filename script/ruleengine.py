@@ -1,7 +1,17 @@
 from abc import abstractmethod
 from typing import ClassVar, Any, List, Dict
+import importlib
+import itertools
 import logging
 import inspect
+import time
+from metrics import REGISTRY
+
+RULE_ENGINE_SECONDS = REGISTRY.histogram('rule_engine_execution_seconds', 'Duration of the rule engine executions.',
+                                         (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 0.025, 0.1, 1.0))
+RULE_ENGINE_ITERATIONS = REGISTRY.histogram('rule_engine_iterations', 'Iterations of the rule engine executions.',
+                                            (1, 2, 3, 4, 6, 8, 16, 64, 256, 1024))
+RULES_FIRED = REGISTRY.counter('rules_fired_total', 'Rules fired, by rule.', ('rule',))
 
 class Rule:
     """Base class for rules."""
@@ -45,13 +55,169 @@ class Rule:
          """
          raise NotImplementedError()
 
+class RuleLoopError(RuntimeError):
+    """Raised when the rule engine loop runs out of its budget, or returns to an earlier context state."""
+
+    def __init__(self, reason: str, rules: list[str], iterations: int):
+        super().__init__(f'{reason} after {iterations} iterations, rules involved: {", ".join(rules)}')
+        self.reason = reason
+        self.rules = rules
+        self.iterations = iterations
+
+def _hashable(value: Any) -> Any:
+    """Hashable summary of a context value, by identity if the value is mutable without containers."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return id(value)
+
+class _LoopGuard:
+    """
+    Budget of one rule engine loop. The iterations (and if set, the duration)
+    are counted from the start, the states of the context are only hashed
+    after RuleEngine.cycle_detection_after iterations, normal runs ending
+    well before that.
+    """
+
+    __slots__ = ('iterations', 'deadline', 'states', 'agendas')
+
+    def __init__(self):
+        self.iterations = 0
+        self.deadline = time.perf_counter() + RuleEngine.max_duration \
+                        if RuleEngine.max_duration is not None else None
+        self.states = {}
+        self.agendas = []
+
+    def after_iteration(self, context: 'RuleEngine.Context', agenda: list[Rule]) -> None:
+        """Checks the budget after an iteration, raises RuleLoopError if the loop is runaway."""
+        self.iterations += 1
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise RuleLoopError('Time budget exceeded', self._rules(self.agendas[-1:] or [agenda]),
+                                self.iterations)
+        if self.iterations >= RuleEngine.max_iterations:
+            raise RuleLoopError('Iteration budget exceeded',
+                                self._rules((self.agendas + [agenda])[-RuleEngine.cycle_detection_after:]),
+                                self.iterations)
+        if self.iterations < RuleEngine.cycle_detection_after:
+            return
+
+        # The state the next iteration starts from: the changed attributes with their values and the actions
+        self.agendas.append(agenda)
+        state = (frozenset((name, _hashable(context.get(name))) for name in context.peek_changed_attributes()),
+                 _hashable(context.actions))
+        if state in self.states:
+            raise RuleLoopError('Repeating context state', self._rules(self.agendas[self.states[state]:]),
+                                self.iterations)
+        self.states[state] = len(self.agendas)
+
+    @staticmethod
+    def _rules(agendas: list[list[Rule]]) -> list[str]:
+        """The names of the rules fired in the agendas, in first firing order."""
+        return list(dict.fromkeys(rule.__name__ for agenda in agendas for rule in agenda))
+
+class LazyRule:
+    """
+    Registered rule whose module is not imported yet (see rules.load_rule_packs).
+    The module is imported when the context first has the arguments of the
+    rule, its rules replacing their placeholders in the rule engine.
+    """
+
+    def __init__(self, module: str, name: str, required_arg_names: tuple[str, ...], priority: int,
+                 absent_arg_names: tuple[str, ...] = ()):
+        self.__module__ = module
+        self.__name__ = name
+        self.required_arg_names = required_arg_names
+        self.absent_arg_names = absent_arg_names
+        self.priority = priority
+        self.rule_class = None
+
+    def has_argument_changed(self, changed_args: list[str]) -> bool:
+        return any([arg in changed_args for arg in self.required_arg_names])
+
+    def has_required_arguments(self, context: 'RuleEngine.Context') -> bool:
+        """Matches the names of the arguments, then (importing the rule) the types."""
+        for arg_name in self.required_arg_names:
+            if context.has_attribute(arg_name) == (arg_name in self.absent_arg_names):
+                return False
+        return self.load().has_required_arguments(context)
+
+    def load(self) -> type[Rule]:
+        """Imports the module of the rule, returns the registered rule class."""
+        if self.rule_class is None:
+            importlib.import_module(self.__module__)
+            if self.rule_class is None:
+                raise AssertionError(f'Rule {self.__name__} is not registered by {self.__module__}')
+        return self.rule_class
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        return f'LazyRule({self.__module__}.{self.__name__})'
+
+class _SyncRunner:
+    """
+    Runs the awaitables of asynchronous rules to completion in sync mode, on
+    one event loop per rule engine execution (created on the first awaitable).
+    """
+
+    __slots__ = ('_runner',)
+
+    def __init__(self):
+        self._runner = None
+
+    def wait_for(self, value: Any) -> Any:
+        if not inspect.isawaitable(value):
+            return value
+        if self._runner is None:
+            import asyncio  # Imported on use, being slow to import and only needed by asynchronous rules
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                self._runner = asyncio.Runner()
+            else:
+                if inspect.iscoroutine(value):
+                    value.close()
+                raise AssertionError('Asynchronous rules in a running event loop require execute_rules_async')
+
+        async def wait():
+            return await value
+        return self._runner.run(wait())
+
+    def close(self) -> None:
+        if self._runner is not None:
+            self._runner.close()
+            self._runner = None
+
 class RuleEngine:
     """Rule engine for evaluating rules."""
     
     """List of registered rule classes."""
     rules: ClassVar[list[Rule]] = []
 
+    """The placeholders of the registered rules not imported yet, by module and name."""
+    _lazy_rules: ClassVar[dict[tuple[str, str], LazyRule]] = {}
+
     logger: ClassVar[logging.Logger] = logging.getLogger('RuleEngine')
+
+    """Optional observer of the executions (see rulejournal.py), None when not tracing."""
+    tracer: ClassVar[Any] = None
+
+    """The number of iterations after which a rule engine loop is stopped with RuleLoopError."""
+    max_iterations: ClassVar[int] = 1000
+
+    """The duration (seconds) after which a rule engine loop is stopped with RuleLoopError, None for no limit."""
+    max_duration: ClassVar[float | None] = None
+
+    """The number of iterations after which the repeating context states are detected."""
+    cycle_detection_after: ClassVar[int] = 16
     
     class Context:
         """Context class for passing information to and between rules."""
@@ -103,6 +269,10 @@ class RuleEngine:
             self._changed_attributes.clear()
             return changed_attributes
 
+        def peek_changed_attributes(self) -> set[str]:
+            """Queries changed attributes since the last invocation of changed_attributes, without clearing them."""
+            return self._changed_attributes.copy()
+
         def has_changed(self):
             """Queries whether there are any changed attributes without clearing them."""
             return len(self._changed_attributes) != 0
@@ -128,43 +298,188 @@ class RuleEngine:
 
     @classmethod
     def register_rule(cls, rule_class) -> None:
-        """Registers a rule within the rule engine."""
-        cls.rules.append(rule_class)
+        """Registers a rule within the rule engine, in place of its placeholder if it has one."""
+        rule_class.fired_counter = RULES_FIRED.labels(rule_class.__name__)
+        lazy_rule = cls._lazy_rules.pop((rule_class.__module__, rule_class.__name__), None)
+        if lazy_rule is None:
+            cls.rules.append(rule_class)
+            return
+        lazy_rule.rule_class = rule_class
+        cls.rules[cls.rules.index(lazy_rule)] = rule_class
+
+    @classmethod
+    def register_lazy_rule(cls, lazy_rule: LazyRule) -> None:
+        """Registers the placeholder of a rule, the rule replacing it when its module is imported."""
+        lazy_rule.fired_counter = RULES_FIRED.labels(lazy_rule.__name__)
+        cls._lazy_rules[(lazy_rule.__module__, lazy_rule.__name__)] = lazy_rule
+        cls.rules.append(lazy_rule)
+
+    @staticmethod
+    def _gather_rule_args(rule_class, context: Context) -> dict:
+        """Gathers the arguments required by the specified rule from the context."""
+        return {arg_name: context.get(arg_name) if arg_type is not None else None
+                for arg_name, arg_type in rule_class.required_args.items()}
+
+    @classmethod
+    def _fire_rules(cls, context: Context, candidates: list[Rule], runner: _SyncRunner) -> list[Rule]:
+        """
+        Fires the eligible rules of the candidates (in priority order) on the
+        context, returns them. The asynchronous rules are run by the runner.
+        """
+        agenda = [rule for rule in candidates
+                  if rule.has_required_arguments(context)
+                  and runner.wait_for(rule.when(context, **cls._gather_rule_args(rule, context)))]
+        agenda.sort(key=lambda rule: rule.priority, reverse=True)
+        cls.logger.debug(f'Agenda sorted, agenda={[rule.__name__ for rule in agenda]}')
+        for rule in agenda:
+            rule.fired_counter.inc()
+            runner.wait_for(rule.then(context, **cls._gather_rule_args(rule, context)))
+        return agenda
+
+    @classmethod
+    async def _fire_rules_async(cls, context: Context, candidates: list[Rule]) -> list[Rule]:
+        """
+        Fires the eligible rules of the candidates on the context (returning
+        them), awaiting the asynchronous conditions and actions. The rules of
+        a priority band are started in order and their awaitables run
+        concurrently, the next band starts after all of them finished.
+        """
+        import asyncio
+        eligible = [rule for rule in candidates if rule.has_required_arguments(context)]
+        conditions = [rule.when(context, **cls._gather_rule_args(rule, context)) for rule in eligible]
+        awaited = iter(await asyncio.gather(*[condition for condition in conditions
+                                              if inspect.isawaitable(condition)]))
+        conditions = [next(awaited) if inspect.isawaitable(condition) else condition
+                      for condition in conditions]
+
+        agenda = [rule for rule, condition in zip(eligible, conditions) if condition]
+        agenda.sort(key=lambda rule: rule.priority, reverse=True)
+        cls.logger.debug(f'Agenda sorted, agenda={[rule.__name__ for rule in agenda]}')
+        for _, band in itertools.groupby(agenda, key=lambda rule: rule.priority):
+            band = list(band)
+            for rule in band:
+                rule.fired_counter.inc()
+            results = [rule.then(context, **cls._gather_rule_args(rule, context)) for rule in band]
+            await asyncio.gather(*[result for result in results if inspect.isawaitable(result)])
+        return agenda
 
     @classmethod
     def execute_rules(cls, context: Context | Dict) -> Context:
-        """Executes the rules."""
+        """
+        Executes the rules. Raises RuleLoopError if the rules keep changing the
+        context beyond the iteration (or time) budget, or return it to an
+        earlier state.
+        """
 
         if isinstance(context, Dict):
             context = RuleEngine.Context(context)
 
+        tracer = cls.tracer
+        if tracer is not None:
+            return tracer.trace(cls._execute_rules, context)
+        return cls._execute_rules(context)
+
+    @classmethod
+    def _execute_rules(cls, context: Context, on_iteration = None) -> Context:
+        """
+        Runs the rule engine loop. The optional callback is called after every
+        iteration with the context, the changed attributes and the fired rules.
+        """
+        start = time.perf_counter()
         changed_attributes = context.changed_attributes()
+        guard = _LoopGuard()
+        runner = _SyncRunner()
         cls.logger.setLevel(logging.DEBUG)
 
-        def gather_rule_args(rule_class):
-            """Gathers the arguments required by the specified rule from the context."""
-            return {arg_name: context.get(arg_name) if arg_type is not None else None
-                    for arg_name, arg_type in rule_class.required_args.items()}
+        cls.logger.debug('====== Rule engine started ======')
+        try:
+            while changed_attributes or context.actions:
+                cls.logger.debug(f'Iteration, changed_attributes={changed_attributes}')
+                agenda = cls._fire_rules(context, [rule for rule in cls.rules
+                                                   if rule.has_argument_changed(changed_attributes)], runner)
+                if on_iteration is not None:
+                    on_iteration(context, changed_attributes, agenda)
+                guard.after_iteration(context, agenda)
+                changed_attributes = context.changed_attributes()
+        finally:
+            runner.close()
+            RULE_ENGINE_SECONDS.observe(time.perf_counter() - start)
+            RULE_ENGINE_ITERATIONS.observe(guard.iterations)
 
-        def can_rule_fire(rule_class):
-            """Determines whether the specified rule is eligible for execution."""
-            return rule_class.has_required_arguments(context) \
-                   and rule_class.has_argument_changed(changed_attributes) \
-                   and rule_class.when(context, **gather_rule_args(rule_class))
+        return context
 
-        cls.logger.debug('====== Rule engine started ======')
-        while changed_attributes or context.actions:
-            cls.logger.debug(f'Iteration, changed_attributes={changed_attributes}')
-            agenda = [rule for rule in cls.rules if can_rule_fire(rule)]
-            agenda.sort(key=lambda rule: rule.priority, reverse=True)
-            cls.logger.debug(f'Agenda sorted, agenda={[rule.__name__ for rule in agenda]}')
-            for rule in agenda:
-                rule.then(context, **gather_rule_args(rule))
+    @classmethod
+    async def execute_rules_async(cls, context: Context | Dict) -> Context:
+        """
+        Executes the rules like execute_rules, also supporting rules with
+        asynchronous when(...) and then(...) methods (e.g. rules doing I/O).
+        The awaitables of rules with the same priority run concurrently.
+        """
+
+        if isinstance(context, Dict):
+            context = RuleEngine.Context(context)
+
+        start = time.perf_counter()
+        changed_attributes = context.changed_attributes()
+        guard = _LoopGuard()
+        cls.logger.setLevel(logging.DEBUG)
 
-            changed_attributes = context.changed_attributes()
+        cls.logger.debug('====== Rule engine started (async) ======')
+        try:
+            while changed_attributes or context.actions:
+                cls.logger.debug(f'Iteration, changed_attributes={changed_attributes}')
+                agenda = await cls._fire_rules_async(context, [rule for rule in cls.rules
+                                                               if rule.has_argument_changed(changed_attributes)])
+                guard.after_iteration(context, agenda)
+                changed_attributes = context.changed_attributes()
+        finally:
+            RULE_ENGINE_SECONDS.observe(time.perf_counter() - start)
+            RULE_ENGINE_ITERATIONS.observe(guard.iterations)
 
         return context
 
+    @classmethod
+    def execute_rules_batch(cls, contexts: list[Context | Dict]) -> list[Context]:
+        """
+        Executes the rules on independent contexts (e.g. one per character) in a
+        single engine run. Every context is evaluated exactly like by
+        execute_rules, the contexts advance together iteration by iteration.
+        The rules whose arguments changed are selected once for every distinct
+        set of changed attributes, instead of once per context.
+        """
+        contexts = [RuleEngine.Context(context) if isinstance(context, Dict) else context
+                    for context in contexts]
+        start = time.perf_counter()
+        guards = [_LoopGuard() for _ in contexts]
+        pending = [(context, context.changed_attributes(), guard) for context, guard in zip(contexts, guards)]
+        candidates_by_changes = {}
+        runner = _SyncRunner()
+        cls.logger.setLevel(logging.DEBUG)
+
+        cls.logger.debug(f'====== Rule engine started, batch of {len(contexts)} ======')
+        try:
+            while pending:
+                next_pending = []
+                for context, changed_attributes, guard in pending:
+                    if not changed_attributes and not context.actions:
+                        continue
+                    cls.logger.debug(f'Iteration, changed_attributes={changed_attributes}')
+                    key = frozenset(changed_attributes)
+                    candidates = candidates_by_changes.get(key)
+                    if candidates is None:
+                        candidates = candidates_by_changes[key] = [rule for rule in cls.rules
+                                                                   if rule.has_argument_changed(changed_attributes)]
+                    guard.after_iteration(context, cls._fire_rules(context, candidates, runner))
+                    next_pending.append((context, context.changed_attributes(), guard))
+                pending = next_pending
+        finally:
+            runner.close()
+            RULE_ENGINE_SECONDS.observe(time.perf_counter() - start)
+            for guard in guards:
+                RULE_ENGINE_ITERATIONS.observe(guard.iterations)
+
+        return contexts
+
 def accepts_keywords(*allowed_keywords):
     """Searches the keyword arguments of another decorator for not allowed keywords."""
     def decorator(decorator_func):
@@ -0,0 +1,283 @@
+"""Recording of rule engine executions into a journal, and replaying them against the current engine."""
+
+from __future__ import annotations
+from contextlib import redirect_stdout
+from enum import Enum
+from typing import Any, Callable, Iterator
+import argparse
+import gzip
+import importlib
+import os
+import pickle
+import random
+import time
+from dice import Dice
+from ruleengine import RuleEngine
+
+"""Version of the journal file format."""
+FILE_VERSION = 1
+
+def fingerprint(value: Any) -> Any:
+    """
+    Comparable summary of an attribute value: primitives and the (interned)
+    dice, damage and currency values as themselves, enums by name, containers
+    recursively, any other object by its type.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (list, tuple)):
+        return [fingerprint(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(repr(fingerprint(item)) for item in value)
+    if isinstance(value, dict):
+        return {repr(fingerprint(key)): fingerprint(item) for key, item in value.items()}
+    if hasattr(type(value), '_instances'):
+        return repr(value)
+    return f'<{type(value).__qualname__}>'
+
+class RecordingRandom:
+    """Random generator of the dice recording every draw."""
+
+    def __init__(self, rng = random):
+        self.rng = rng
+        self.draws = []
+
+    def randint(self, a: int, b: int) -> int:
+        value = self.rng.randint(a, b)
+        self.draws.append(value)
+        return value
+
+class ReplayingRandom:
+    """Random generator of the dice returning recorded draws, then fresh ones when they ran out."""
+
+    def __init__(self, draws: list[int], rng = random):
+        self.draws = iter(draws)
+        self.rng = rng
+        self.num_mismatches = 0
+
+    def randint(self, a: int, b: int) -> int:
+        value = next(self.draws, None)
+        if value is None or not a <= value <= b:
+            self.num_mismatches += 1
+            return self.rng.randint(a, b)
+        return value
+
+class JournalRecord:
+    """One recorded top-level execute_rules call."""
+
+    """The type of every input attribute."""
+    shape: dict[str, str]
+
+    """The pickled input context."""
+    context: bytes
+
+    """The changed attributes, the fired rules and the fingerprints of the deltas of every iteration."""
+    iterations: list[tuple[list[str], list[str], dict[str, Any]]]
+
+    """The dice draws during the execution."""
+    draws: list[int]
+
+    """The duration of the execution (seconds)."""
+    duration: float
+
+    """The type of the exception raised by the execution, None if it finished."""
+    error: str | None
+
+    def __init__(self, shape, context, iterations, draws, duration, error):
+        self.shape = shape
+        self.context = context
+        self.iterations = iterations
+        self.draws = draws
+        self.duration = duration
+        self.error = error
+
+def _shape(context: RuleEngine.Context) -> dict[str, str]:
+    return {name: type(context.get(name)).__qualname__ for name in sorted(context._attributes)}
+
+def _run(run: Callable, context: RuleEngine.Context) -> tuple[list, float, str | None]:
+    """Runs the engine loop on the context, collecting the iterations, the duration and the error."""
+    iterations = []
+
+    def on_iteration(context: RuleEngine.Context, changed_attributes: set[str], agenda: list) -> None:
+        deltas = context.peek_changed_attributes()
+        iterations.append((sorted(changed_attributes),
+                           [rule.__name__ for rule in agenda],
+                           {name: fingerprint(context.get(name)) for name in sorted(deltas)}))
+
+    error = None
+    start = time.perf_counter()
+    try:
+        run(context, on_iteration)
+    except Exception as exception:
+        error = exception
+    return iterations, time.perf_counter() - start, error
+
+class JournalRecorder:
+    """
+    Records every top-level RuleEngine.execute_rules call while active (as a
+    context manager) into a gzip compressed journal of pickled records.
+    Rule engine runs started by rules (nested calls) are part of the record
+    of the outer call. Recording is opt-in: the engine checks a single class
+    attribute when it is not active.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.num_records = 0
+        self._file = None
+        self._depth = 0
+        self._rng = None
+
+    def __enter__(self) -> JournalRecorder:
+        assert RuleEngine.tracer is None, 'Another tracer is already active'
+        self._file = gzip.open(self.filename, 'wb')
+        modules = sorted({rule.__module__ for rule in RuleEngine.rules})
+        pickle.dump({'version': FILE_VERSION, 'rule_modules': modules}, self._file, pickle.HIGHEST_PROTOCOL)
+        self._rng = Dice.rng
+        RuleEngine.tracer = self
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        RuleEngine.tracer = None
+        Dice.rng = self._rng
+        self._file.close()
+
+    def trace(self, run: Callable, context: RuleEngine.Context) -> RuleEngine.Context:
+        """Runs the rule engine loop on the context (called by RuleEngine.execute_rules)."""
+        if self._depth:
+            return run(context)
+
+        shape = _shape(context)
+        snapshot = pickle.dumps(context, pickle.HIGHEST_PROTOCOL)
+        rng = Dice.rng = RecordingRandom(self._rng)
+        self._depth += 1
+        try:
+            iterations, duration, error = _run(run, context)
+        finally:
+            self._depth -= 1
+            Dice.rng = self._rng
+
+        # Stored as a tuple, the journals being readable also when recorded by running this module
+        record = (shape, snapshot, iterations, rng.draws, duration,
+                  type(error).__name__ if error is not None else None)
+        pickle.dump(record, self._file, pickle.HIGHEST_PROTOCOL)
+        self.num_records += 1
+        if error is not None:
+            raise error
+        return context
+
+class Divergence:
+    """A difference between a recorded and a replayed execution."""
+
+    def __init__(self, record_index: int, iteration: int | None, message: str):
+        self.record_index = record_index
+        self.iteration = iteration
+        self.message = message
+
+    def __str__(self) -> str:
+        where = f'record {self.record_index}' if self.iteration is None \
+                else f'record {self.record_index}, iteration {self.iteration}'
+        return f'{where}: {self.message}'
+
+class ReplayReport:
+    """The divergences and the timing of a replayed journal."""
+
+    def __init__(self):
+        self.num_records = 0
+        self.divergences: list[Divergence] = []
+        self.recorded_duration = 0.0
+        self.replayed_duration = 0.0
+
+    @property
+    def num_diverged_records(self) -> int:
+        return len({divergence.record_index for divergence in self.divergences})
+
+    def __str__(self) -> str:
+        change = (self.replayed_duration / self.recorded_duration - 1) * 100 if self.recorded_duration else 0.0
+        lines = [f'{self.num_records} records, {self.num_diverged_records} diverged',
+                 f'recorded {self.recorded_duration * 1000:.1f} ms, '
+                 f'replayed {self.replayed_duration * 1000:.1f} ms ({change:+.1f}%)']
+        lines.extend(f'  {divergence}' for divergence in self.divergences)
+        return '\n'.join(lines)
+
+class JournalReplayer:
+    """Re-runs the records of a journal against the current rule engine, with the recorded dice draws."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def records(self) -> Iterator[JournalRecord]:
+        """Reads the records of the journal, importing the rule modules that were registered."""
+        with gzip.open(self.filename, 'rb') as file:
+            header = pickle.load(file)
+            if header.get('version') != FILE_VERSION:
+                raise AssertionError(f'Unsupported journal version: {header.get("version")}')
+            for module in header['rule_modules']:
+                importlib.import_module(module)
+            while True:
+                try:
+                    yield JournalRecord(*pickle.load(file))
+                except EOFError:
+                    return
+
+    def replay(self, quiet: bool = True) -> ReplayReport:
+        """Replays every record, with the output of the rules discarded if quiet."""
+        report = ReplayReport()
+        with open(os.devnull, 'w') as devnull:
+            for index, record in enumerate(self.records()):
+                if quiet:
+                    with redirect_stdout(devnull):
+                        self._replay_record(index, record, report)
+                else:
+                    self._replay_record(index, record, report)
+        return report
+
+    def _replay_record(self, index: int, record: JournalRecord, report: ReplayReport) -> None:
+        context = pickle.loads(record.context)
+        rng = Dice.rng
+        replaying = Dice.rng = ReplayingRandom(record.draws, rng)
+        try:
+            iterations, duration, error = _run(RuleEngine._execute_rules, context)
+        finally:
+            Dice.rng = rng
+
+        report.num_records += 1
+        report.recorded_duration += record.duration
+        report.replayed_duration += duration
+
+        def diverged(iteration: int | None, message: str) -> None:
+            report.divergences.append(Divergence(index, iteration, message))
+
+        for iteration, (recorded, replayed) in enumerate(zip(record.iterations, iterations)):
+            for name, recorded_part, replayed_part in zip(('changed attributes', 'agenda', 'deltas'),
+                                                          recorded, replayed):
+                if recorded_part != replayed_part:
+                    diverged(iteration, f'{name} {recorded_part} != {replayed_part}')
+        if len(record.iterations) != len(iterations):
+            diverged(None, f'{len(record.iterations)} iterations recorded, {len(iterations)} replayed')
+        error = type(error).__name__ if error is not None else None
+        if record.error != error:
+            diverged(None, f'error {record.error} != {error}')
+        if replaying.num_mismatches or next(replaying.draws, None) is not None:
+            diverged(None, 'dice draws differ')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Records or replays a journal of rule engine executions.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help='records a profiler workload')
+    record_parser.add_argument('workload', help='the workload of profiler.py')
+    record_parser.add_argument('-n', '--num-iterations', type=int, default=100)
+    record_parser.add_argument('-o', '--output', default='rules.journal')
+    replay_parser = subparsers.add_parser('replay', help='replays a journal')
+    replay_parser.add_argument('journal')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from profiler import WORKLOADS
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), JournalRecorder(args.output) as recorder:
+            WORKLOADS[args.workload](args.num_iterations)
+        print(f'{recorder.num_records} records: {args.output}')
+    else:
+        print(JournalReplayer(args.journal).replay())
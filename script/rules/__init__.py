@@ -0,0 +1,51 @@
+"""
+Rule packs: the modules of rules, registering their rules within the rule
+engine when imported.
+
+The rule packs can be loaded lazily with load_rule_packs: the name, the
+required arguments and the priority of the rules of a pack are cached on
+disk (next to the module, like the content cache), and a pack is imported
+only when a context first has the arguments of one of its rules.
+"""
+
+from __future__ import annotations
+import importlib
+import importlib.util
+import sys
+from contentcache import ContentCache
+from ruleengine import LazyRule, RuleEngine
+
+"""The rule packs of the game rules, in registration order."""
+RULE_PACKS = ('rules.armorclass', 'rules.damage', 'rules.checks')
+
+def _read_rule_metadata(module_name: str) -> list[tuple[str, tuple[str, ...], int, tuple[str, ...]]]:
+    """
+    Imports the rule pack, returns the name, the required arguments, the
+    priority and the arguments required to be absent of its rules.
+    """
+    importlib.import_module(module_name)
+    return [(rule.__name__, tuple(rule.required_args), rule.priority,
+             tuple(name for name, arg_type in rule.required_args.items() if arg_type is None))
+            for rule in RuleEngine.rules if rule.__module__ == module_name]
+
+def load_rule_packs(module_names: tuple[str, ...] = RULE_PACKS, lazy = True) -> None:
+    """
+    Registers the rules of the rule packs. If lazy, the packs whose metadata
+    is cached register placeholders of their rules instead of being imported.
+    """
+    for module_name in module_names:
+        if module_name in sys.modules:
+            continue
+        if not lazy:
+            importlib.import_module(module_name)
+            continue
+
+        filename = importlib.util.find_spec(module_name).origin
+        metadata = ContentCache.load(filename, lambda _: _read_rule_metadata(module_name))
+
+        # Reading the metadata of an uncached pack imports it
+        if module_name in sys.modules:
+            continue
+        for name, required_arg_names, priority, absent_arg_names in metadata:
+            RuleEngine.register_lazy_rule(LazyRule(module_name, name, required_arg_names, priority,
+                                                   absent_arg_names))
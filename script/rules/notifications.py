@@ -0,0 +1,43 @@
+"""Collection of asynchronous rules notifying external services about character events."""
+
+import asyncio
+from ruleengine import *
+from character import *
+
+class NotificationService:
+    """Local stand-in for an external (chat, persistence) service, with a simulated latency."""
+
+    """The simulated round-trip time of a request (seconds)."""
+    latency: ClassVar[float] = 0.05
+
+    """The messages received by the service."""
+    messages: ClassVar[list[str]] = []
+
+    @classmethod
+    async def send(cls, message: str) -> None:
+        await asyncio.sleep(cls.latency)
+        cls.messages.append(message)
+
+@rule
+class NotifyExperienceGained(Rule):
+    def when(context: RuleEngine.Context, actions: List, character: Character, gained_experience: int) -> bool:
+        return 'on:experience_gained' in actions
+
+    async def then(context: RuleEngine.Context, character: Character, gained_experience: int, **kwargs):
+        await NotificationService.send(f'{character.name} gained {gained_experience} XP.')
+
+@rule
+class NotifyLevelGained(Rule):
+    def when(context: RuleEngine.Context, actions: List, character: Character, reached_level: int) -> bool:
+        return 'on:level_gained' in actions
+
+    async def then(context: RuleEngine.Context, character: Character, reached_level: int, **kwargs):
+        await NotificationService.send(f'{character.name} reached level {reached_level}.')
+
+@rule(priority=-1)
+class PersistCharacterProgress(Rule):
+    async def when(context: RuleEngine.Context, actions: List, character: Character) -> bool:
+        return 'on:experience_gained' in actions
+
+    async def then(context: RuleEngine.Context, character: Character, **kwargs):
+        await NotificationService.send(f'Saved {character.name} with {character.experience} XP.')
@@ -0,0 +1,377 @@
+"""Asyncio server hosting concurrent game sessions, with a local client for testing."""
+
+from __future__ import annotations
+from collections import deque
+from typing import Any
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import time
+from character import Character, Ability, Skill, Condition
+from gamecontroller import GameController
+from initiative import EncounterScheduler
+from race import RaceRegistry
+from ruleengine import RuleEngine
+from simulation import attack_with_character
+import rules.armorclass  # Registers the armor class rules used when equipping armors
+import rules.checks      # Registers the ability check rules used by the check command
+
+class SessionError(Exception):
+    """Error of a request caused by the client, reported in the response."""
+    pass
+
+class GameSession:
+    """
+    A game session: its characters and the state of its encounter. Every
+    session shares the same content catalog, which is not modified by them.
+    """
+
+    """The commands the clients can send to the sessions."""
+    COMMANDS = ('create_character', 'character', 'equip', 'attack', 'check', 'rest',
+                'start_encounter', 'next_turn')
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.characters: dict[str, Character] = {}
+        self.dead: set[str] = set()
+        self.encounter: EncounterScheduler | None = None
+        self.lock = asyncio.Lock()
+
+    def execute(self, command: str, args: dict) -> tuple[Any, list[str]]:
+        """Executes the command, returns its result and the messages printed by the rules."""
+        if command not in self.COMMANDS:
+            raise SessionError(f'Unknown command: "{command}"')
+
+        # The commands run synchronously on the event loop, so the output of the rules is captured per command
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = getattr(self, command)(**args)
+        return result, output.getvalue().splitlines()
+
+    def _character(self, name: str, is_alive = True) -> Character:
+        if name not in self.characters:
+            raise SessionError(f'Unknown character: "{name}"')
+        if is_alive and name in self.dead:
+            raise SessionError(f'{name} is dead')
+        return self.characters[name]
+
+    def describe(self, character: Character) -> dict:
+        return {'name': character.name, 'level': character.level, 'is_dead': character.name in self.dead,
+                'hitpoints': character.hitpoints,
+                'max_hitpoints': character.max_hitpoints, 'armor_class': character.armor_class,
+                'armor': character.equipped_armor_id, 'shield': character.equipped_shield_id,
+                'weapon': character.equipped_weapon_id,
+                'conditions': sorted(condition.name for condition in character.active_conditions)}
+
+    ## Commands
+    ## ========
+
+    def create_character(self, name: str, ability_scores: dict[str, int] = None, hitpoints = 30,
+                         race: str = None, subrace: str = None) -> dict:
+        if name in self.characters:
+            raise SessionError(f'Character "{name}" already exists')
+        character = Character()
+        character.name = name
+        for ability, score in (ability_scores or {}).items():
+            character.ability_scores[Ability[ability.upper()]] = score
+        if race is not None:
+            RaceRegistry.apply(character, race, subrace)
+        character.hitpoints = character.max_hitpoints = hitpoints
+        character.update_armor_class()
+        self.characters[name] = character
+        return self.describe(character)
+
+    def character(self, name: str) -> dict:
+        return self.describe(self._character(name, is_alive=False))
+
+    def equip(self, name: str, armor: str = None, shield: str = None, weapon: str = None) -> dict:
+        character = self._character(name)
+        for item_id, catalog in ((armor, GameController.armors), (shield, GameController.armors),
+                                 (weapon, GameController.weapons)):
+            if item_id and item_id not in catalog:
+                raise SessionError(f'Unknown item: "{item_id}"')
+
+        if armor is not None:
+            character.equip_armor(armor) if armor else character.unequip_armor()
+        if shield is not None:
+            character.equip_shield(shield) if shield else character.unequip_shield()
+        if weapon is not None:
+            character.equipped_weapon_id = weapon
+        return self.describe(character)
+
+    def attack(self, source: str, target: str) -> dict:
+        attacker, defender = self._character(source), self._character(target)
+        if attacker.hitpoints == 0:
+            raise SessionError(f'{attacker.name} is unconscious')
+        try:
+            is_hit = attack_with_character(attacker, defender)
+            is_dead = False
+        except NotImplementedError:
+            is_hit = is_dead = True
+            self.dead.add(defender.name)
+        if defender.hitpoints == 0:
+            defender.active_conditions.add(Condition.UNCONSCIOUS)
+        return {'is_hit': is_hit, 'is_dead': is_dead, 'target': self.describe(defender)}
+
+    def check(self, name: str, difficulty_class: int = None, ability: str = None, skill: str = None) -> dict:
+        character = self._character(name)
+        if skill is not None:
+            total = character.roll_skill_check(Skill[skill.upper()])
+        elif ability is not None:
+            context = RuleEngine.execute_rules({'actions': ['roll_ability_check'], 'character': character,
+                                                'ability': Ability[ability.upper()]})
+            total = context.get('result')
+        else:
+            raise SessionError('Either an ability or a skill is required')
+        return {'total': total,
+                'is_success': total >= difficulty_class if difficulty_class is not None else None}
+
+    def rest(self, name: str, kind = 'short', num_hit_dice = 1) -> dict:
+        character = self._character(name)
+        if kind == 'long':
+            character.do_long_rest()
+        elif kind == 'short':
+            character.do_short_rest(num_hit_dice)
+        else:
+            raise SessionError(f'Unknown rest: "{kind}"')
+        return self.describe(character)
+
+    def start_encounter(self, names: list[str] = None) -> list[str]:
+        combatants = [self._character(name) for name in names] if names is not None \
+                     else [character for name, character in self.characters.items() if name not in self.dead]
+        self.encounter = EncounterScheduler(combatants)
+        return [combatant.name for combatant in self.encounter.turn_order()]
+
+    def next_turn(self) -> dict:
+        if self.encounter is None:
+            raise SessionError('There is no encounter in progress')
+        combatant = self.encounter.next_turn()
+        return {'round': self.encounter.round, 'name': combatant.name if combatant is not None else None}
+
+class ServerMetrics:
+    """Request counts, latencies and throughput of the server."""
+
+    def __init__(self, window = 10.0, max_samples = 100000):
+        self.window = window
+        self.started = time.perf_counter()
+        self.num_requests = 0
+        self.num_errors = 0
+        self.num_rejected = 0
+        self.requests_by_command: dict[str, int] = {}
+        self._latencies = deque(maxlen=max_samples)
+        self._completions = deque()
+
+    def record(self, command: str, latency: float, is_error: bool) -> None:
+        now = time.perf_counter()
+        self.num_requests += 1
+        self.num_errors += is_error
+        self.requests_by_command[command] = self.requests_by_command.get(command, 0) + 1
+        self._latencies.append(latency)
+        self._completions.append(now)
+        while self._completions[0] < now - self.window:
+            self._completions.popleft()
+
+    def snapshot(self) -> dict:
+        """Returns the metrics, latencies in milliseconds over the recent requests."""
+        latencies = sorted(self._latencies)
+        def percentile(fraction: float) -> float | None:
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else None
+
+        uptime = time.perf_counter() - self.started
+        return {'uptime': uptime, 'requests': self.num_requests, 'errors': self.num_errors,
+                'rejected': self.num_rejected, 'requests_by_command': dict(self.requests_by_command),
+                'throughput': len(self._completions) / min(self.window, uptime) if uptime > 0 else 0.0,
+                'latency_p50': percentile(0.50), 'latency_p95': percentile(0.95),
+                'latency_p99': percentile(0.99), 'latency_max': latencies[-1] * 1000 if latencies else None}
+
+class GameServer:
+    """
+    Asyncio TCP server of game sessions, speaking JSON lines.
+
+    Every request is a JSON object with an "id", a "command" and the
+    arguments of the command, session commands also name their "session":
+        {"id": 1, "command": "create_session"}
+        {"id": 2, "session": "s1", "command": "attack", "source": "a", "target": "b"}
+    Every response echoes the "id" with "ok" and the "result" (and the
+    messages of the rules in "log"), or "ok": false and the "error".
+
+    The requests of a session are executed one after the other under the lock
+    of the session, while the sessions run concurrently. Every connection has
+    a limited number of requests in flight, it is not read any further until
+    one of them completes; the server rejects new sessions above its limit.
+    """
+
+    def __init__(self, host = '127.0.0.1', port = 0, max_sessions = 10000, max_in_flight = 64):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.max_in_flight = max_in_flight
+        self.sessions: dict[str, GameSession] = {}
+        self.metrics = ServerMetrics()
+        self._session_ids = itertools.count(1)
+        self._server = None
+
+    async def start(self) -> None:
+        """Loads the shared content catalog and starts listening, on a free port if none is specified."""
+        GameController.load_weapons_and_armors()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=1 << 20)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                await in_flight.acquire()
+                line = await reader.readline()
+                if not line:
+                    in_flight.release()
+                    break
+                task = asyncio.create_task(self._handle_request(line, writer, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, line: bytes, writer: asyncio.StreamWriter, in_flight: asyncio.Semaphore) -> None:
+        started = time.perf_counter()
+        request_id, command = None, None
+        is_error = True
+        try:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise SessionError('The request has to be a JSON object')
+                request_id = request.pop('id', None)
+                command = request.pop('command', None)
+                result, log = await self.dispatch(command, request)
+                response = {'id': request_id, 'ok': True, 'result': result, 'log': log}
+            except Exception as error:
+                # Every error (e.g. also a RuleLoopError of the rules) is reported, not leaving the client waiting
+                response = {'id': request_id, 'ok': False, 'error': f'{type(error).__name__}: {error}'}
+
+            is_error = not response['ok']
+            writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+            await writer.drain()
+        finally:
+            in_flight.release()
+            self.metrics.record(str(command), time.perf_counter() - started, is_error)
+
+    async def dispatch(self, command: str, args: dict) -> tuple[Any, list[str]]:
+        """Executes a server or session command."""
+        match command:
+            case 'create_session':
+                if len(self.sessions) >= self.max_sessions:
+                    self.metrics.num_rejected += 1
+                    raise SessionError('Too many sessions')
+                session = GameSession(f's{next(self._session_ids)}')
+                self.sessions[session.id] = session
+                return session.id, []
+            case 'close_session':
+                if self.sessions.pop(args.get('session'), None) is None:
+                    raise SessionError(f'Unknown session: "{args.get("session")}"')
+                return None, []
+            case 'metrics':
+                return dict(self.metrics.snapshot(), sessions=len(self.sessions)), []
+
+        session = self.sessions.get(args.pop('session', None))
+        if session is None:
+            raise SessionError('Unknown session')
+        async with session.lock:
+            return session.execute(command, args)
+
+class GameClient:
+    """Client of the game server, pipelining requests over one connection."""
+
+    def __init__(self):
+        self._request_ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader = self._writer = self._receiver = None
+
+    async def connect(self, host: str, port: int) -> None:
+        self._reader, self._writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        self._receiver = asyncio.create_task(self._receive())
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
+
+    async def _receive(self) -> None:
+        while line := await self._reader.readline():
+            response = json.loads(line)
+            future = self._pending.pop(response['id'], None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def request(self, command: str, **args) -> Any:
+        """Sends the request and returns its result, raising SessionError if it failed."""
+        request_id = next(self._request_ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(json.dumps({'id': request_id, 'command': command, **args}).encode() + b'\n')
+        await self._writer.drain()
+        response = await future
+        if not response['ok']:
+            raise SessionError(response['error'])
+        return response['result']
+
+async def run_load_test(num_clients: int, sessions_per_client: int, num_rounds: int) -> dict:
+    """Runs a local server with clients playing duels in many sessions, returns the server metrics."""
+    server = GameServer()
+    await server.start()
+
+    async def play(client: GameClient) -> None:
+        session = await client.request('create_session')
+        await client.request('create_character', session=session, name='a', ability_scores={'strength': 16})
+        await client.request('create_character', session=session, name='b', ability_scores={'dexterity': 16})
+        await client.request('equip', session=session, name='a', armor='chain_mail', weapon='longsword')
+        await client.request('equip', session=session, name='b', armor='leather', shield='shield',
+                             weapon='rapier')
+        for _ in range(num_rounds):
+            await client.request('attack', session=session, source='a', target='b')
+            await client.request('attack', session=session, source='b', target='a')
+            await client.request('check', session=session, name='b', skill='stealth', difficulty_class=12)
+            await client.request('rest', session=session, name='a', kind='long')
+            await client.request('rest', session=session, name='b', kind='long')
+        await client.request('close_session', session=session)
+
+    clients = [GameClient() for _ in range(num_clients)]
+    for client in clients:
+        await client.connect(server.host, server.port)
+    await asyncio.gather(*[play(client) for client in clients for _ in range(sessions_per_client)])
+    metrics = await clients[0].request('metrics')
+    for client in clients:
+        await client.close()
+    await server.stop()
+    return metrics
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the game session server, or a local load test.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--load-test', action='store_true', help='run a local load test instead of serving')
+    parser.add_argument('--clients', type=int, default=10, help='number of load test connections')
+    parser.add_argument('--sessions', type=int, default=100, help='number of load test sessions per connection')
+    parser.add_argument('--rounds', type=int, default=5, help='number of load test rounds per session')
+    args = parser.parse_args()
+
+    if args.load_test:
+        print(json.dumps(asyncio.run(run_load_test(args.clients, args.sessions, args.rounds)), indent=2))
+    else:
+        asyncio.run(GameServer(args.host, args.port).serve_forever())
@@ -0,0 +1,213 @@
+"""Read-only catalog of weapons and armors shared between processes through a memory-mapped file."""
+
+from __future__ import annotations
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator
+import mmap
+import os
+import struct
+import tempfile
+from armor import Armor, ArmorType
+from currency import Currency
+from dice import DiceRoll
+from gamecontroller import GameController
+from weapon import Weapon, WeaponType, DamageRoll, DamageType
+
+"""Enum members by their index in the encoding."""
+_WEAPON_TYPES = list(WeaponType)
+_ARMOR_TYPES = list(ArmorType)
+_DAMAGE_TYPES = list(DamageType)
+
+class SharedCatalog:
+    """
+    Weapon and armor catalog encoded in a compact fixed layout and published in
+    a memory-mapped file, which worker processes attach to without copying or
+    parsing the content again.
+
+    Layout (little-endian):
+      - header: magic, number of weapons, number of armors
+      - weapon records, followed by armor records (fixed size, see the structs)
+      - string table holding the UTF-8 IDs and names referenced by the records
+    """
+
+    MAGIC = b'RDNDCAT1'
+    HEADER = struct.Struct('<8sII')
+
+    # id offset, id length, name offset, name length, type, cost (copper),
+    # dice rolls, dice sides (0 for fix damage), fix damage, damage type,
+    # weight, ranged, finesse
+    WEAPON_RECORD = struct.Struct('<IHIHBIBBiBf??')
+
+    # id offset, id length, name offset, name length, type, cost (copper),
+    # armor class, weight, minimum strength, stealth disadvantage
+    ARMOR_RECORD = struct.Struct('<IHIHBIHfB?')
+
+    def __init__(self, filename: str, owner = False):
+        """Attaches to the catalog published in the specified file."""
+        self.filename = filename
+        self._owner = owner
+        self._replaced_catalogs = None
+        with open(filename, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        magic, num_weapons, num_armors = self.HEADER.unpack_from(self._buffer, 0)
+        assert magic == self.MAGIC, f'Not a shared catalog: "{filename}"'
+        armors_offset = self.HEADER.size + num_weapons * self.WEAPON_RECORD.size
+        strings_offset = armors_offset + num_armors * self.ARMOR_RECORD.size
+        self.weapons = SharedCatalogView(self._buffer, self.HEADER.size, num_weapons, strings_offset,
+                                         self.WEAPON_RECORD, self._decode_weapon)
+        self.armors = SharedCatalogView(self._buffer, armors_offset, num_armors, strings_offset,
+                                        self.ARMOR_RECORD, self._decode_armor)
+
+    @classmethod
+    def publish(cls, weapons: Mapping[str, Weapon] = None, armors: Mapping[str, Armor] = None,
+                filename: str = None) -> SharedCatalog:
+        """
+        Encodes the catalog (the GameController catalog by default) into a file,
+        placed in shared memory (/dev/shm) where available. The returned catalog
+        owns the file and removes it when closed.
+        """
+        weapons = weapons if weapons is not None else GameController.weapons
+        armors = armors if armors is not None else GameController.armors
+
+        strings = bytearray()
+        def add_string(value: str) -> tuple[int, int]:
+            encoded = value.encode()
+            strings.extend(encoded)
+            return len(strings) - len(encoded), len(encoded)
+
+        records = bytearray()
+        for weapon_id, weapon in weapons.items():
+            value = weapon.damage._value
+            num_rolls, num_sides, fixed = (0, 0, value) if isinstance(value, int) \
+                                          else (value.num_rolls, value.num_sides, 0)
+            records += cls.WEAPON_RECORD.pack(*add_string(weapon_id), *add_string(weapon.name),
+                                              _WEAPON_TYPES.index(weapon.type), weapon.cost.value,
+                                              num_rolls, num_sides, fixed,
+                                              _DAMAGE_TYPES.index(weapon.damage.type), weapon.weight,
+                                              weapon.is_ranged, weapon.is_finesse)
+        for armor_id, armor in armors.items():
+            records += cls.ARMOR_RECORD.pack(*add_string(armor_id), *add_string(armor.name),
+                                             _ARMOR_TYPES.index(armor.type), armor.cost.value,
+                                             armor.armor_class, armor.weight, armor.min_strength,
+                                             armor.has_stealth_disadvantage)
+
+        # String offsets are relative to the string table, which follows the records
+        header = cls.HEADER.pack(cls.MAGIC, len(weapons), len(armors))
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        if filename is None:
+            descriptor, filename = tempfile.mkstemp(prefix='rules-dnd-catalog-', dir=directory)
+            file = os.fdopen(descriptor, 'wb')
+        else:
+            file = open(filename, 'wb')
+        with file:
+            file.write(header + records + strings)
+
+        return cls(filename, owner=True)
+
+    @classmethod
+    def install(cls, filename: str) -> SharedCatalog:
+        """
+        Attaches to a published catalog and installs it as the GameController
+        catalog, until it is closed. Intended as the initializer of pool
+        worker processes.
+        """
+        catalog = cls(filename)
+        catalog._replaced_catalogs = (GameController.weapons, GameController.armors)
+        GameController.weapons = catalog.weapons
+        GameController.armors = catalog.armors
+        return catalog
+
+    def close(self) -> None:
+        """
+        Detaches from the catalog, removing the file if this process published
+        it. An installed catalog gives the GameController catalog back.
+        """
+        if self._replaced_catalogs is not None:
+            if GameController.weapons is self.weapons:
+                GameController.weapons = self._replaced_catalogs[0]
+            if GameController.armors is self.armors:
+                GameController.armors = self._replaced_catalogs[1]
+            self._replaced_catalogs = None
+        self.weapons = self.armors = None
+        self._buffer.release()
+        self._mmap.close()
+        if self._owner:
+            os.remove(self.filename)
+
+    def __enter__(self) -> SharedCatalog:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    ## Decoding
+    ## ========
+
+    @staticmethod
+    def _decode_weapon(name: str, fields: tuple) -> Weapon:
+        type, cost, num_rolls, num_sides, fixed, damage_type, weight, is_ranged, is_finesse = fields
+        value = DiceRoll(num_rolls, num_sides) if num_sides else fixed
+        return Weapon(name, _WEAPON_TYPES[type], Currency(cost),
+                      DamageRoll(value, _DAMAGE_TYPES[damage_type]),
+                      SharedCatalog._decode_weight(weight), is_ranged, is_finesse)
+
+    @staticmethod
+    def _decode_armor(name: str, fields: tuple) -> Armor:
+        type, cost, armor_class, weight, min_strength, has_stealth_disadvantage = fields
+        return Armor(name, Currency(cost), armor_class, _ARMOR_TYPES[type],
+                     SharedCatalog._decode_weight(weight), min_strength, has_stealth_disadvantage)
+
+    @staticmethod
+    def _decode_weight(weight: float) -> int | float:
+        """Restores integral weights as integers, like they are read from the YAML catalog."""
+        return int(weight) if weight.is_integer() else weight
+
+class SharedCatalogView(Mapping):
+    """Read-only mapping over the records of a shared catalog, materializing the items on first access."""
+
+    def __init__(self, buffer: memoryview, offset: int, count: int, strings_offset: int,
+                 record: struct.Struct, decode: Callable[[str, tuple], Any]):
+        self._buffer = buffer
+        self._record = record
+        self._decode = decode
+        self._items = {}
+        self._strings_offset = strings_offset
+
+        # Only the IDs are decoded up-front, to find the records by ID
+        self._offsets = {}
+        for index in range(count):
+            record_offset = offset + index * record.size
+            id_offset, id_length = struct.unpack_from('<IH', buffer, record_offset)
+            self._offsets[self._string(id_offset, id_length)] = record_offset
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return str(self._buffer[start:start + length], 'utf-8')
+
+    def __getitem__(self, item_id: str) -> Any:
+        item = self._items.get(item_id)
+        if item is None:
+            _, _, name_offset, name_length, *fields = self._record.unpack_from(self._buffer,
+                                                                             self._offsets[item_id])
+            item = self._items[item_id] = self._decode(self._string(name_offset, name_length), fields)
+        return item
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def is_loaded(self) -> bool:
+        return len(self._items) == len(self._offsets)
+
+    def warm_up(self, use_cache = True) -> None:
+        """Materializes every item of the catalog."""
+        for item_id in self._offsets:
+            self[item_id]
@@ -0,0 +1,73 @@
+"""Simulation of fights between characters."""
+
+from character import Character, Condition
+from combatlog import EventLog
+from metrics import REGISTRY
+
+FIGHTS_SIMULATED = REGISTRY.counter('fights_simulated_total', 'Fights simulated.')
+FIGHT_ROUNDS = REGISTRY.histogram('fight_rounds', 'Rounds per simulated fight.', (1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50))
+
+def attack_with_character(source: Character, target: Character) -> bool:
+    """Performs one attack of the source character against the target, returns whether it hit."""
+    weapon = source.equipped_weapon
+    EventLog.emit('attack', source=source.name, target=target.name,
+                  weapon=weapon.name if weapon is not None else 'Unarmed strike')
+    attack_roll_base, attack_roll = source.roll_attack()
+    is_critical_hit = attack_roll_base == 20
+    is_hit = is_critical_hit or attack_roll > target.armor_class
+    if is_hit:
+        EventLog.emit('hit', source=source.name, target=target.name, is_critical_hit=is_critical_hit,
+                      attack_roll=attack_roll, armor_class=target.armor_class)
+        damage, damage_type = source.roll_damage(is_critical_hit)
+        target.suffer_damage(damage, damage_type, is_critical_hit)
+        EventLog.emit('damage', target=target.name, damage=damage, damage_type=damage_type.name,
+                      hitpoints=target.hitpoints)
+    else:
+        EventLog.emit('miss', source=source.name, target=target.name,
+                      attack_roll=attack_roll, armor_class=target.armor_class)
+    return is_hit
+
+def create_duelists() -> tuple[Character, Character]:
+    """Creates the two example characters used for fight simulations."""
+    c1 = Character()
+    c1.name = 'Barbarian'
+    c1.equipped_armor_id = 'plate'
+    c1.equipped_weapon_id = 'greatsword'
+    c1.active_conditions.add(Condition.BLINDED)
+
+    c2 = Character()
+    c2.name = 'Monk'
+    c2.equipped_armor_id = 'leather'
+    c2.equipped_weapon_id = 'quarterstaff'
+    return c1, c2
+
+def simulate_fight(c1: Character = None, c2: Character = None) -> tuple[Character, Character, int]:
+    """
+    Simulates a fight until one of the characters reaches zero hitpoints.
+
+    The characters attack each other in turns, starting with c1. If no
+    characters are given, the example duelists are used. Returns the
+    winner, the loser and the number of attacks made during the fight.
+    """
+    if c1 is None or c2 is None:
+        c1, c2 = create_duelists()
+
+    EventLog.emit('fight_started', first=c1.name, second=c2.name)
+
+    source = c1
+    target = c2
+    num_turns = 0
+    while c1.hitpoints > 0 and c2.hitpoints > 0:
+        attack_with_character(source, target)
+        (source, target) = (target, source)
+        num_turns += 1
+
+    winner = c1 if c1.hitpoints != 0 else c2
+    loser = c1 if c1.hitpoints == 0 else c2
+    EventLog.emit('fight_ended', winner=winner.name, loser=loser.name,
+                  hitpoints=winner.hitpoints, num_turns=num_turns)
+
+    # Both characters attack once per round
+    FIGHTS_SIMULATED.inc()
+    FIGHT_ROUNDS.observe((num_turns + 1) // 2)
+    return winner, loser, num_turns
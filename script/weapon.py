@@ -1,9 +1,11 @@
 from __future__ import annotations
 from enum import Enum
+from functools import lru_cache
 import re
-import yaml
+import weakref
 from dice import DiceRoll
 from currency import Currency
+from contentcache import load_yaml
 
 class DamageType(Enum):
     ACID = 0,
@@ -21,7 +23,13 @@ class DamageType(Enum):
     THUNDER = 12
 
 class DamageRoll:
-    
+    """
+    Immutable damage roll. Instances are interned: constructing a damage roll
+    returns the existing instance with the same value and type, if there is one.
+    """
+
+    __slots__ = ('_value', 'type', '__weakref__')
+
     """The dice roll or fix value for the damage amount."""
     _value: DiceRoll | int
 
@@ -31,10 +39,40 @@ class DamageRoll:
     """Regular expression for validating damage rolls."""
     REGEX_PATTERN = r'^((\d{1,2}[dD](4|6|8|10|12|20|100))|(\d+))?\s*(.+)$'
 
-    def __init__(self, value: DiceRoll | int, type: DamageType):
+    """The interned instances by their value and type."""
+    _instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, value: DiceRoll | int, type: DamageType):
         """Constructs a damage roll."""
-        self._value = value
-        self.type = type
+        key = (value, type)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = super().__new__(cls)
+            object.__setattr__(instance, '_value', value)
+            object.__setattr__(instance, 'type', type)
+            instance = cls._instances.setdefault(key, instance)
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, DamageRoll):
+            return NotImplemented
+        return (self._value, self.type) == (other._value, other.type)
+
+    def __hash__(self) -> int:
+        return hash((self._value, self.type))
+
+    def __reduce__(self):
+        # Unpickled damage rolls are interned as well
+        return type(self), (self._value, self.type)
+
+    def __repr__(self) -> str:
+        value = self._value if isinstance(self._value, int) else self._value.to_string()
+        return f'DamageRoll({value} {self.type.name.lower()})'
 
     def roll(self) -> int:
         """Rolls the damage value."""
@@ -44,6 +82,7 @@ class DamageRoll:
             return self._value.roll()
 
     @classmethod
+    @lru_cache(maxsize=1024)
     def from_string(cls, damage_str: str) -> DamageRoll:
         """Parses the damage roll from the specified string."""
 
@@ -106,19 +145,21 @@ class Weapon:
 class WeaponReader:
 
     @staticmethod
-    def read_weapons_from_file(filename: str) -> dict[str, Weapon]:
+    def read_weapon(weapon_desc: dict) -> Weapon:
+        """Creates the weapon from its descriptor in the weapon catalog."""
+        name = weapon_desc['name']
+        type = WeaponType[weapon_desc['type'].upper()]
+        cost = Currency.from_string(weapon_desc['cost'])
+        damage = DamageRoll.from_string(weapon_desc['damage'])
+        weight = weapon_desc['weight']
+        is_ranged = weapon_desc.get('ranged', False)
+        is_finesse = weapon_desc.get('finesse', False)
+
+        return Weapon(name, type, cost, damage, weight, is_ranged, is_finesse)
+
+    @classmethod
+    def read_weapons_from_file(cls, filename: str) -> dict[str, Weapon]:
         with open(filename, 'r') as file:
-            weapons = {}
-            weapon_descriptors = yaml.safe_load(file)['weapons']
-            for weapon_desc in weapon_descriptors:
-                id = weapon_desc['id']
-                name = weapon_desc['name']
-                type = WeaponType[weapon_desc['type'].upper()]
-                cost = Currency.from_string(weapon_desc['cost'])
-                damage = DamageRoll.from_string(weapon_desc['damage'])
-                weight = weapon_desc['weight']
-                is_ranged = weapon_desc.get('ranged', False)
-                is_finesse = weapon_desc.get('finesse', False)
-
-                weapons[id] = Weapon(name, type, cost, damage, weight, is_ranged, is_finesse)
-            return weapons
\ No newline at end of file
+            weapon_descriptors = load_yaml(file)['weapons']
+            return {weapon_desc['id']: cls.read_weapon(weapon_desc) 
+                    for weapon_desc in weapon_descriptors}
\ No newline at end of file
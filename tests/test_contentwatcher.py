@@ -0,0 +1,43 @@
+"""Tests of the hot reloading of the content files."""
+
+import logging
+import os
+import shutil
+import pytest
+from contentwatcher import ContentWatcher, WatchedCatalog
+from gamecontroller import GameController
+
+@pytest.fixture
+def weapons_file(tmp_path, monkeypatch):
+    """A copy of the weapon catalog file, watched in place of the original (restored with its items afterwards)."""
+    filename = str(tmp_path / 'weapons.yaml')
+    shutil.copy(GameController.weapons.filename, filename)
+    monkeypatch.setattr(GameController.weapons, 'filename', filename)
+    monkeypatch.setattr(GameController.weapons, '_state', None)
+    return filename
+
+def _append(filename: str, text: str) -> None:
+    with open(filename, 'a') as file:
+        file.write(text)
+    # The signature changes even within the resolution of the modification time
+    os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 1))
+
+def test_broken_content_file_is_logged_and_keeps_the_catalog(weapons_file, caplog):
+    watcher = ContentWatcher()
+    _append(weapons_file, '\n  - id: [broken\n')
+
+    with caplog.at_level(logging.WARNING, logger='ContentWatcher'):
+        assert watcher.poll() == {}
+    assert any(record.levelno == logging.WARNING and record.exc_info for record in caplog.records)
+    assert 'longsword' in GameController.weapons
+
+def test_reload_bug_is_raised(weapons_file, monkeypatch):
+    def reload(self):
+        raise ZeroDivisionError()
+
+    watcher = ContentWatcher()
+    monkeypatch.setattr(WatchedCatalog, 'reload', reload)
+    _append(weapons_file, '\n')
+
+    with pytest.raises(ZeroDivisionError):
+        watcher.poll()
@@ -0,0 +1,22 @@
+"""Tests of applying the precompiled races to characters."""
+
+import pytest
+from character import Ability, Character
+from race import RaceRegistry
+
+def test_race_and_subrace_are_applied():
+    character = Character()
+    constitution = character.ability_scores[Ability.CONSTITUTION]
+    RaceRegistry.apply(character, 'dwarf', 'hill_dwarf')
+
+    assert (character.race_id, character.subrace_id) == ('dwarf', 'hill_dwarf')
+    assert character.ability_scores[Ability.CONSTITUTION] > constitution
+
+def test_race_is_not_applied_twice():
+    character = Character()
+    RaceRegistry.apply(character, 'dwarf', 'hill_dwarf')
+    scores = dict(character.ability_scores)
+
+    with pytest.raises(AssertionError):
+        RaceRegistry.apply(character, 'elf', 'high_elf')
+    assert character.ability_scores == scores
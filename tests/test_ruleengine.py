@@ -0,0 +1,115 @@
+"""Tests of the loop guard and the metrics of the rule engine."""
+
+import asyncio
+import time
+import pytest
+from ruleengine import RULE_ENGINE_ITERATIONS, RULE_ENGINE_SECONDS, RuleEngine, RuleLoopError, Rule, rule
+
+@pytest.fixture(autouse=True)
+def rule_engine(monkeypatch):
+    """Registers the rules of a test in an empty rule engine, restored afterwards."""
+    monkeypatch.setattr(RuleEngine, 'rules', [])
+    monkeypatch.setattr(RuleEngine, '_lazy_rules', {})
+    monkeypatch.setattr(RuleEngine, 'max_iterations', 1000)
+    monkeypatch.setattr(RuleEngine, 'max_duration', None)
+    monkeypatch.setattr(RuleEngine, 'cycle_detection_after', 16)
+
+def _register_counter_rule(delay: float = 0.0) -> None:
+    @rule
+    class IncrementCounter(Rule):
+        def when(context: RuleEngine.Context, counter: int) -> bool:
+            return True
+
+        def then(context: RuleEngine.Context, counter: int) -> None:
+            if delay:
+                time.sleep(delay)
+            context.update('counter', counter + 1)
+
+def _execute(mode: str, attributes: dict) -> RuleEngine.Context:
+    if mode == 'sync':
+        return RuleEngine.execute_rules(attributes)
+    if mode == 'async':
+        return asyncio.run(RuleEngine.execute_rules_async(attributes))
+    return RuleEngine.execute_rules_batch([attributes])[0]
+
+MODES = ('sync', 'async', 'batch')
+
+@pytest.mark.parametrize('mode', MODES)
+def test_iteration_budget_below_cycle_detection(mode):
+    RuleEngine.max_iterations = 5
+    _register_counter_rule()
+
+    with pytest.raises(RuleLoopError) as error:
+        _execute(mode, {'counter': 0})
+    assert error.value.reason == 'Iteration budget exceeded'
+    assert error.value.iterations == 5
+    assert error.value.rules == ['IncrementCounter']
+
+@pytest.mark.parametrize('mode', MODES)
+def test_iteration_budget(mode):
+    RuleEngine.max_iterations = 40
+    _register_counter_rule()
+
+    with pytest.raises(RuleLoopError) as error:
+        _execute(mode, {'counter': 0})
+    assert error.value.reason == 'Iteration budget exceeded'
+    assert error.value.iterations == 40
+
+@pytest.mark.parametrize('mode', MODES)
+def test_time_budget(mode):
+    RuleEngine.max_duration = 0.02
+    _register_counter_rule(delay=0.005)
+
+    with pytest.raises(RuleLoopError) as error:
+        _execute(mode, {'counter': 0})
+    assert error.value.reason == 'Time budget exceeded'
+    assert error.value.rules == ['IncrementCounter']
+    assert error.value.iterations < RuleEngine.max_iterations
+
+@pytest.mark.parametrize('mode', MODES)
+def test_repeating_context_state(mode):
+    @rule
+    class FlipFlag(Rule):
+        def when(context: RuleEngine.Context, flag: bool) -> bool:
+            return True
+
+        def then(context: RuleEngine.Context, flag: bool) -> None:
+            context.update('flag', not flag)
+
+    with pytest.raises(RuleLoopError) as error:
+        _execute(mode, {'flag': False})
+    assert error.value.reason == 'Repeating context state'
+    assert error.value.rules == ['FlipFlag']
+    assert error.value.iterations <= RuleEngine.cycle_detection_after + 2
+
+@pytest.mark.parametrize('mode', MODES)
+def test_finite_run_is_not_stopped(mode):
+    RuleEngine.max_iterations = 5
+
+    @rule
+    class CountToThree(Rule):
+        def when(context: RuleEngine.Context, counter: int) -> bool:
+            return counter < 3
+
+        def then(context: RuleEngine.Context, counter: int) -> None:
+            context.update('counter', counter + 1)
+
+    assert _execute(mode, {'counter': 0}).get('counter') == 3
+
+def test_batch_execution_is_observed():
+    @rule
+    class CountToThree(Rule):
+        def when(context: RuleEngine.Context, counter: int) -> bool:
+            return counter < 3
+
+        def then(context: RuleEngine.Context, counter: int) -> None:
+            context.update('counter', counter + 1)
+
+    executions = RULE_ENGINE_SECONDS.labels().totals()[-1]
+    iterations = RULE_ENGINE_ITERATIONS.labels().totals()
+    RuleEngine.execute_rules_batch([{'counter': 0}, {'counter': 2}])
+
+    assert RULE_ENGINE_SECONDS.labels().totals()[-1] == executions + 1
+    observed = RULE_ENGINE_ITERATIONS.labels().totals()
+    assert observed[-1] == iterations[-1] + 2
+    assert observed[-2] == iterations[-2] + 4 + 2
@@ -0,0 +1,36 @@
+"""Tests of the game session server."""
+
+import asyncio
+import json
+from server import GameServer
+
+async def _send_lines(lines: list[bytes], max_in_flight: int) -> list[dict]:
+    """Sends the raw request lines to a local server, returns the responses in arrival order."""
+    server = GameServer(max_in_flight=max_in_flight)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        for line in lines:
+            writer.write(line + b'\n')
+        await writer.drain()
+        responses = [json.loads(await asyncio.wait_for(reader.readline(), timeout=5)) for _ in lines]
+        writer.close()
+        await writer.wait_closed()
+        return responses
+    finally:
+        await server.stop()
+
+def test_malformed_requests_get_error_replies():
+    session_line = b'{"id": 0, "command": "create_session"}'
+    malformed_lines = [b'"hello"', b'[1, 2]', b'42', b'not json',
+                       b'{"id": 1, "command": "create_character", "session": "s1", "name": "a", "ability_scores": [1]}',
+                       b'{"id": 2, "command": "no_such_command", "session": "s1"}']
+
+    # More malformed requests than slots in flight: a failed request must give back its slot
+    lines = [session_line] + malformed_lines * 2 + [b'{"id": 3, "command": "metrics"}']
+    responses = asyncio.run(_send_lines(lines, max_in_flight=4))
+
+    assert len(responses) == len(lines)
+    errors = [response for response in responses if not response['ok']]
+    assert len(errors) == 2 * len(malformed_lines)
+    assert all(response['error'] for response in errors)
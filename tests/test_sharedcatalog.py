@@ -0,0 +1,15 @@
+"""Tests of the catalog shared between processes."""
+
+from gamecontroller import GameController
+from sharedcatalog import SharedCatalog
+
+def test_closing_an_installed_catalog_restores_the_game_controller_catalog():
+    weapons, armors = GameController.weapons, GameController.armors
+    with SharedCatalog.publish() as published:
+        catalog = SharedCatalog.install(published.filename)
+        assert GameController.weapons['longsword'].name == weapons['longsword'].name
+        catalog.close()
+
+    assert GameController.weapons is weapons
+    assert GameController.armors is armors
+    assert GameController.weapons['longsword'].name